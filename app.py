@@ -1,89 +1,255 @@
-from flask import Flask, request, jsonify, make_response
+from flask import Blueprint, Flask, request, jsonify, make_response
 from flask_cors import CORS
-import pandas as pd
-import numpy as np
 from datetime import datetime
 import os
 import json
 import threading
 import time
+import hashlib
+import hmac
+import math
+import re
 
-app = Flask(__name__)
-CORS(app, origins=['*'])
+import recommendation_cache
+
+# pandas, numpy y el motor NumPy se importan con la primera carga del
+# catálogo (ver import_data_libraries): /health y las herramientas que solo
+# importan el módulo no pagan ese costo.
+pd = None
+np = None
+recommendation_engine = None
+
+bp = Blueprint('recomendador', __name__)
 
 # Configuración global
-PRODUCTS_FILE = 'shopify_products.json'
+PRODUCTS_FILE = os.getenv('PRODUCTS_FILE', 'shopify_products.json')
 UPDATE_INTERVAL = 3600
+LOAD_RETRY_BASE_SECONDS = 5
+LOAD_RETRY_MAX_SECONDS = 300
+# Recarga manual por worker (POST /api/reload); vacío = endpoint deshabilitado
+RELOAD_TOKEN = os.getenv('RELOAD_TOKEN', '')
+
+# Selección de opciones por paso
+OPTIONS_PER_STEP = 2
+DIVERSIFY_VENDORS = False
+ROUTINE_PRICE_BANDS = {}  # p.ej. {"Rutina Básica": (10000, 30000)}
+BUDGET_CANDIDATES_PER_STEP = 8
+# Más baratos por paso que se suman a los candidatos con presupuesto: así "no
+# hay combinaciones" solo se informa si ninguna combinación cabe
+BUDGET_CHEAPEST_PER_STEP = 2
+
+# Motor de recomendación: numpy (arreglos compilados en la carga) o pandas
+RECOMMENDATION_ENGINE = os.getenv('RECOMMENDATION_ENGINE', 'numpy').lower()
+
+# Imágenes: variantes de tamaño del CDN de Shopify para las tarjetas del quiz (sufijo _<ancho>x)
+IMAGE_VARIANT_WIDTHS = [200, 400]
+IMAGE_COLUMNS = ['imagen_url'] + [f'imagen_url_{width}x' for width in IMAGE_VARIANT_WIDTHS]
+SHOPIFY_IMAGE_PATTERN = (
+    r'^(?P<base>https://(?:cdn\.shopify\.com|[^/?#]+/cdn/shop)/[^?#]+?)'
+    r'(?:_(?:\d+x\d*|x\d+|pico|icon|thumb|small|compact|medium|large|grande|original|master))?'
+    r'(?P<ext>\.(?:jpe?g|png|gif|webp|avif))(?P<query>\?[^#]*)?$'
+)
+
+# Popularidad por velocidad de ventas (calculada en catalog_sync)
+SALES_WINDOW_DAYS = 90
+SALES_VELOCITY_WEIGHT = 0.5
+LOW_COVER_DAYS = 14
+MAX_DAYS_OF_COVER = 365
+
+# Rutinas en orden de presentación
+RUTINAS_ORDENADAS = [
+    ("Rutina Básica", ["limpiador en espuma", "hidratante", "protector solar"]),
+    ("Rutina Intermedia", ["limpiador en espuma", "tónico", "serum", "hidratante", "protector solar"]),
+    ("Rutina Completa", ["limpiador oleoso", "limpiador en espuma", "tónico", "serum", "hidratante", "protector solar"])
+]
+ROUTINE_STEPS = sorted({paso for _, pasos in RUTINAS_ORDENADAS for paso in pasos})
+
+# Recarga incremental: campos de origen de las columnas derivadas de cada variante
+FINGERPRINT_FIELDS = ['product_id', 'title', 'product_type', 'tags_str', 'price', 'stock',
+                      'sales_velocity', 'total_sold', 'days_of_cover']
+SCORE_COLUMNS = ['sales_velocity', 'days_of_cover', 'demand_score', 'prob_popularidad', 'base_ranking_score']
+# Columnas del índice que usa el pipeline de recomendación (las que versionan la caché)
+RECOMMENDATION_COLUMNS = ['product_id', 'available', 'etiquetas_shopify', 'step_category', 'collection_handles',
+                          'tags_str', 'stock', 'base_ranking_score', 'price', 'vendor', 'name', 'precio',
+                          'url', 'imagen_url']
+
 last_update = None
-products_df = pd.DataFrame()
+products_df = None
+products_index = None
+compiled_catalog = None
+catalog_generation = None
+catalog_versions = {}
+image_stats = {}
 update_thread = None
 
+# Caché de recomendaciones compartida entre workers (ver recommendation_cache.py)
+RECOMMENDATION_CACHE_VERSION = 3
+cache_backend = recommendation_cache.create_cache_backend()
+
+# Estado de carga compartido entre hilos (single-flight + backoff)
+_load_lock = threading.Lock()
+_load_failures = 0
+_next_load_attempt = 0.0
+
+def import_data_libraries():
+    """Importa pandas, numpy y el motor NumPy (la primera vez que se carga el catálogo)"""
+    global pd, np, recommendation_engine
+    if pd is None:
+        import numpy as np
+        import pandas as pd
+        import recommendation_engine
+
+def catalog_loaded():
+    """True si hay un catálogo cargado con productos"""
+    return products_df is not None and not products_df.empty
+
 def load_products_from_file():
-    """Carga productos desde el archivo JSON con manejo de imágenes"""
-    global products_df, last_update
+    """Carga productos desde el archivo JSON con manejo de imágenes.
+    
+    Si ya hay un catálogo cargado, la recarga es incremental: cada variante
+    lleva un fingerprint de sus campos de origen y solo las nuevas o
+    modificadas se vuelven a categorizar; el índice por producto se rearma
+    solo para los productos afectados.
+    """
+    global products_df, products_index, compiled_catalog, catalog_generation, catalog_versions, image_stats
+    global last_update
     
     print(f"=== CARGANDO PRODUCTOS ===")
     print(f"Buscando archivo: {PRODUCTS_FILE}")
-    print(f"Directorio actual: {os.getcwd()}")
-    print(f"Archivos disponibles: {os.listdir('.')}")
     
     try:
+        load_start = time.perf_counter()
+        import_data_libraries()
+        
         if not os.path.exists(PRODUCTS_FILE):
             print(f"❌ Archivo {PRODUCTS_FILE} NO encontrado")
+            print(f"Directorio actual: {os.getcwd()}")
+            print(f"Archivos disponibles: {os.listdir('.')}")
             return False
             
         print(f"Archivo {PRODUCTS_FILE} encontrado!")
-        with open(PRODUCTS_FILE, 'r', encoding='utf-8') as f:
-            products_data = json.load(f)
+        with open(PRODUCTS_FILE, 'rb') as f:
+            raw_data = f.read()
+        products_data = json.loads(raw_data.decode('utf-8'))
+        generation = hashlib.sha256(raw_data).hexdigest()[:16]
+        
+        if generation == catalog_generation and catalog_loaded():
+            print(f"✅ Catálogo sin cambios (generación {generation})")
+            last_update = datetime.now()
+            return True
         
         print(f"Datos JSON cargados: {len(products_data)} productos")
-        products_df = pd.DataFrame(products_data)
+        df = pd.DataFrame(products_data)
         
         # Asegurar columnas necesarias
         required_columns = ['product_id', 'variant_id', 'title', 'sku', 'price', 
                            'stock', 'product_type', 'vendor', 'tags', 'handle', 'image_url']
         
         for col in required_columns:
-            if col not in products_df.columns:
-                products_df[col] = ''
+            if col not in df.columns:
+                df[col] = ''
         
         # Procesar datos
-        products_df['price'] = pd.to_numeric(products_df['price'], errors='coerce').fillna(0)
-        products_df['stock'] = pd.to_numeric(products_df['stock'], errors='coerce').fillna(0).astype(int)
-        products_df['available'] = products_df['stock'] > 0
+        df['price'] = pd.to_numeric(df['price'], errors='coerce').fillna(0)
+        df['stock'] = pd.to_numeric(df['stock'], errors='coerce').fillna(0).astype(int)
+        df['available'] = df['stock'] > 0
         
         # Procesar tags
-        products_df['tags_str'] = products_df['tags'].apply(
+        df['tags_str'] = df['tags'].apply(
             lambda x: ', '.join(x) if isinstance(x, list) else str(x)
         )
         
         # Asegurar colecciones
-        if 'collection_handles' not in products_df.columns:
-            products_df['collection_handles'] = products_df.apply(lambda x: [], axis=1)
-        if 'collection_titles' not in products_df.columns:
-            products_df['collection_titles'] = products_df.apply(lambda x: [], axis=1)
+        if 'collection_handles' not in df.columns:
+            df['collection_handles'] = df.apply(lambda x: [], axis=1)
+        if 'collection_titles' not in df.columns:
+            df['collection_titles'] = df.apply(lambda x: [], axis=1)
         
         # Mapear campos
-        products_df['name'] = products_df['title']
-        products_df['precio'] = products_df['price']
-        products_df['tipo_producto'] = products_df['product_type']
-        products_df['etiquetas_shopify'] = products_df['tags_str']
-        products_df['url'] = products_df['handle'].apply(lambda x: f"/products/{x}" if x else '')
-        products_df['imagen_url'] = products_df['image_url'].fillna('')
+        df['name'] = df['title']
+        df['precio'] = df['price']
+        df['tipo_producto'] = df['product_type']
+        df['etiquetas_shopify'] = df['tags_str']
+        df['url'] = df['handle'].apply(lambda x: f"/products/{x}" if x else '')
+        add_image_columns(df)
+        
+        # Diff contra el catálogo actual por variant_id
+        df['record_fingerprint'] = record_fingerprints(df)
+        previous = products_df
+        # Solo se compara contra un catálogo con las mismas columnas de origen
+        incremental = (
+            catalog_loaded() and 'record_fingerprint' in previous.columns
+            and list(previous.columns[:len(df.columns)]) == list(df.columns)
+            and df['variant_id'].is_unique and previous['variant_id'].is_unique
+        )
+        if incremental:
+            previous_rows = previous.set_index('variant_id').reindex(df['variant_id'])
+            unchanged = previous_rows['record_fingerprint'].to_numpy() == df['record_fingerprint'].to_numpy()
+        else:
+            unchanged = np.zeros(len(df), dtype=bool)
         
-        # Categorización
-        products_df['tipo_piel'] = products_df.apply(categorize_skin_type, axis=1)
+        # Categorización (solo variantes nuevas o modificadas)
+        df['tipo_piel'] = ''
+        df['step_category'] = ''
+        if unchanged.any():
+            df.loc[unchanged, 'tipo_piel'] = previous_rows['tipo_piel'].to_numpy()[unchanged]
+            df.loc[unchanged, 'step_category'] = previous_rows['step_category'].to_numpy()[unchanged]
+        if not unchanged.all():
+            # Las variantes de un producto comparten título, tipo y tags: cada combinación se categoriza una vez
+            changed_rows = df[~unchanged]
+            sources = (changed_rows['tags_str'].astype(str) + '\x00' + changed_rows['product_type'].astype(str) +
+                       '\x00' + changed_rows['title'].astype(str))
+            codes, _ = pd.factorize(sources)
+            distinct_rows = changed_rows.iloc[np.unique(codes, return_index=True)[1]]
+            df.loc[~unchanged, 'tipo_piel'] = categorize_skin_types(distinct_rows).to_numpy()[codes]
+            df.loc[~unchanged, 'step_category'] = categorize_product_steps(distinct_rows).to_numpy()[codes]
         
         # Popularidad
-        max_stock = products_df['stock'].max() if len(products_df) > 0 else 1
-        products_df['prob_popularidad'] = products_df['stock'] / max(max_stock, 1)
+        add_sales_velocity_columns(df)
+        max_velocity = df['sales_velocity'].max() if len(df) > 0 else 0
+        if max_velocity > 0:
+            df['prob_popularidad'] = df['sales_velocity'] / max_velocity
+        else:
+            max_stock = df['stock'].max() if len(df) > 0 else 1
+            df['prob_popularidad'] = df['stock'] / max(max_stock, 1)
+        df['base_ranking_score'] = compute_base_ranking_scores(df)
         
+        # Índice por producto (una fila por product_id)
+        if incremental:
+            # Los scores dependen de máximos del catálogo: una variante sin cambios
+            # en origen igual puede cambiar de score y afectar a su producto
+            same = unchanged.copy()
+            for col in SCORE_COLUMNS:
+                same &= previous_rows[col].to_numpy() == df[col].to_numpy()
+            removed = ~previous['variant_id'].isin(df['variant_id'])
+            affected_products = set(df.loc[~same, 'product_id']) | set(previous.loc[removed, 'product_id'])
+            index = update_product_index(products_index, df, affected_products)
+            print(f"🔁 Recarga incremental: {int((~unchanged).sum())} variantes nuevas o modificadas, "
+                  f"{int(removed.sum())} eliminadas, {len(affected_products)} productos reindexados")
+        else:
+            index = build_product_index(df)
+        versions = build_catalog_versions(index)
+        compiled = compile_recommendation_engine(index)
+        stats = build_image_stats(df, generation)
+        
+        # Publicar el catálogo completo de una sola vez
+        products_index = index
+        compiled_catalog = compiled
+        products_df = df
+        catalog_versions = versions
+        image_stats = stats
+        previous_generation = catalog_generation
+        catalog_generation = generation
         last_update = datetime.now()
         
+        if previous_generation and previous_generation != generation:
+            cache_backend.prune()
+        
         # Stats
-        products_with_images = products_df[products_df['imagen_url'] != ''].shape[0]
-        print(f"✅ Productos cargados: {len(products_df)} items")
-        print(f"📷 Productos con imágenes: {products_with_images} de {len(products_df)}")
+        print(f"✅ Productos cargados: {len(df)} items ({len(index)} productos únicos), generación {generation}, "
+              f"en {time.perf_counter() - load_start:.2f}s")
+        print(f"📷 Productos con imágenes: {stats['products_with_images']} de {len(df)} "
+              f"({stats['products_with_size_variants']} con variantes de tamaño)")
         
         return True
             
@@ -93,6 +259,279 @@ def load_products_from_file():
         traceback.print_exc()
         return False
 
+def normalize_image_urls(urls):
+    """URLs de imagen limpias: '' si falta y https para las del CDN sin esquema o con http"""
+    urls = urls.where(urls.notna(), '').astype(str).str.strip()
+    urls = urls.mask(urls.isin(['nan', 'None', 'null']), '')
+    urls = urls.str.replace(r'^//', 'https://', regex=True)
+    return urls.str.replace(r'^http://cdn\.shopify\.com/', 'https://cdn.shopify.com/', regex=True)
+
+def shopify_image_variant(urls, width):
+    """URL del CDN de Shopify con el sufijo de tamaño _<ancho>x; las demás quedan igual"""
+    return urls.str.replace(SHOPIFY_IMAGE_PATTERN, rf'\g<base>_{width}x\g<ext>\g<query>',
+                            regex=True, flags=re.IGNORECASE)
+
+def add_image_columns(df):
+    """Normaliza image_url y precalcula las variantes de tamaño (una vez por URL distinta).
+    
+    Las variantes de un producto comparten imagen, así que cada URL se procesa
+    una sola vez; el request ya no limpia strings.
+    """
+    codes, uniques = pd.factorize(df['image_url'].where(df['image_url'].notna(), ''))
+    urls = normalize_image_urls(pd.Series(uniques, dtype=object))
+    df['image_url'] = urls.to_numpy()[codes]
+    df['imagen_url'] = df['image_url']
+    for width in IMAGE_VARIANT_WIDTHS:
+        df[f'imagen_url_{width}x'] = shopify_image_variant(urls, width).to_numpy()[codes]
+    return df
+
+def build_image_stats(df, generation):
+    """Stats de imágenes para /api/debug/images (se calculan una vez por generación del catálogo)"""
+    has_image = df['imagen_url'].to_numpy() != ''
+    total_products = len(df)
+    with_images = int(has_image.sum())
+    resized = 0
+    if IMAGE_VARIANT_WIDTHS:
+        resized = int((df[IMAGE_COLUMNS[1]].to_numpy() != df['imagen_url'].to_numpy()).sum())
+    
+    columns = ['title', 'imagen_url', 'product_type']
+    return {
+        "catalog_generation": generation,
+        "total_products": total_products,
+        "products_with_images": with_images,
+        "products_without_images": total_products - with_images,
+        "products_with_size_variants": resized,
+        "size_variant_widths": IMAGE_VARIANT_WIDTHS,
+        "percentage_with_images": round((with_images / total_products * 100), 2) if total_products > 0 else 0,
+        "examples_with_images": df.loc[has_image, columns + IMAGE_COLUMNS[1:]].head(5).to_dict('records'),
+        "examples_without_images": df.loc[~has_image, columns].head(5).to_dict('records'),
+        "sample_image_urls": df.loc[has_image, 'imagen_url'].head(3).tolist()
+    }
+
+def add_sales_velocity_columns(df):
+    """Normaliza las columnas de velocidad de ventas y días de cobertura.
+    
+    Archivos de sincronizaciones anteriores no traen sales_velocity: en ese
+    caso se estima con total_sold sobre la ventana de ventas.
+    """
+    if 'sales_velocity' in df.columns:
+        velocity = pd.to_numeric(df['sales_velocity'], errors='coerce').fillna(0)
+    elif 'total_sold' in df.columns:
+        velocity = pd.to_numeric(df['total_sold'], errors='coerce').fillna(0) / SALES_WINDOW_DAYS
+    else:
+        velocity = pd.Series(0.0, index=df.index)
+    df['sales_velocity'] = velocity.clip(lower=0).astype(float)
+    
+    stock = df['stock'].to_numpy(dtype=float)
+    velocity_values = df['sales_velocity'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        estimated_cover = np.where(velocity_values > 0, stock / velocity_values, MAX_DAYS_OF_COVER)
+    estimated_cover = np.where(stock > 0, np.minimum(estimated_cover, MAX_DAYS_OF_COVER), 0.0)
+    
+    if 'days_of_cover' in df.columns:
+        df['days_of_cover'] = pd.to_numeric(df['days_of_cover'], errors='coerce').fillna(
+            pd.Series(estimated_cover, index=df.index)
+        )
+    else:
+        df['days_of_cover'] = estimated_cover
+    
+    # Demanda en [0, 1] (escala logarítmica), descontada si el stock se agota pronto
+    max_velocity = df['sales_velocity'].max() if len(df) > 0 else 0
+    if max_velocity > 0:
+        velocity_score = np.log1p(velocity_values) / np.log1p(max_velocity)
+    else:
+        velocity_score = np.zeros(len(df))
+    cover_factor = np.clip(df['days_of_cover'].to_numpy(dtype=float) / LOW_COVER_DAYS, 0, 1)
+    df['demand_score'] = velocity_score * cover_factor
+    return df
+
+def build_product_index(df):
+    """Agrupa las variantes por product_id conservando la mejor variante de cada producto.
+    
+    Tags, colecciones y tipo de producto son comunes a todas las variantes, así
+    que el filtrado puede hacerse por producto. Como representante se toma la
+    variante disponible con mejor base_ranking_score (empates: menor
+    variant_id, así no depende del orden del archivo y la recarga incremental
+    elige la misma) y se agregan el stock total y el conteo de variantes.
+    """
+    if df.empty:
+        return df.copy()
+    
+    variant_order = pd.factorize(df['variant_id'].astype(str), sort=True)[0]
+    order = np.lexsort((
+        variant_order,
+        -df['base_ranking_score'].to_numpy(dtype=float),
+        -df['available'].to_numpy(dtype=int)
+    ))
+    best_variants = df.iloc[order].drop_duplicates('product_id', keep='first').sort_index()
+    
+    stats = df.assign(positive_stock=df['stock'].clip(lower=0)).groupby('product_id', sort=False).agg(
+        product_stock=('positive_stock', 'sum'),
+        variant_count=('variant_id', 'size'),
+        available_variants=('available', 'sum')
+    )
+    
+    index = best_variants.join(stats, on='product_id')
+    index['available_variants'] = index['available_variants'].astype(int)
+    return index
+
+def compile_recommendation_engine(index):
+    """Compila el índice en arreglos para el motor NumPy (None si se usa pandas)"""
+    if RECOMMENDATION_ENGINE != 'numpy' or index.empty:
+        return None
+    return recommendation_engine.compile_catalog(
+        index, ROUTINE_STEPS, get_skin_type_collection_mapping(), CONCERN_TAG_KEYWORDS, IMAGE_COLUMNS
+    )
+
+def record_fingerprints(df):
+    """Hash por variante de los campos de los que salen sus columnas derivadas"""
+    fields = [col for col in FINGERPRINT_FIELDS if col in df.columns]
+    return pd.util.hash_pandas_object(df[fields], index=False).to_numpy()
+
+def update_product_index(previous_index, df, affected_products):
+    """Actualiza el índice por producto rearmando solo los productos afectados.
+    
+    Para el resto se conserva la misma variante representante y sus
+    agregados, tomando la fila actualizada de df. El resultado es igual a
+    build_product_index(df).
+    """
+    positions = pd.Series(np.arange(len(df)), index=df['variant_id'])
+    kept = previous_index[~previous_index['product_id'].isin(affected_products)]
+    stats_columns = ['product_stock', 'variant_count', 'available_variants']
+    
+    kept_rows = df.iloc[positions[kept['variant_id']].to_numpy()]
+    kept_rows = kept_rows.join(pd.DataFrame(kept[stats_columns].to_numpy(), index=kept_rows.index,
+                                            columns=stats_columns).astype(kept[stats_columns].dtypes))
+    
+    affected_rows = df[df['product_id'].isin(affected_products)]
+    if affected_rows.empty:
+        return kept_rows.sort_index()
+    rebuilt = build_product_index(affected_rows)
+    if kept_rows.empty:
+        return rebuilt
+    return pd.concat([kept_rows, rebuilt]).sort_index()
+
+def build_catalog_versions(index):
+    """Digest de las filas del índice por paso y por (paso, tipo de piel).
+    
+    Las claves de la caché de recomendaciones usan solo los digests de lo que
+    cada consulta lee (ver recommendation_generation), así que un cambio en
+    otro paso u otra colección no invalida sus entradas.
+    """
+    if index.empty:
+        return {}
+    
+    relevant = index[[col for col in RECOMMENDATION_COLUMNS if col in index.columns]].copy()
+    relevant['collection_handles'] = relevant['collection_handles'].apply(
+        lambda x: '|'.join(x) if isinstance(x, list) else str(x)
+    )
+    row_hashes = pd.util.hash_pandas_object(relevant, index=False).to_numpy()
+    
+    def digest(mask):
+        return hashlib.sha256(row_hashes[mask].tobytes()).hexdigest()[:16]
+    
+    steps = index['step_category'].to_numpy()
+    available = index['available'].to_numpy(dtype=bool)
+    vegan = index['etiquetas_shopify'].str.contains("vegano|vegan", case=False, na=False).to_numpy()
+    handles = [set(h) if isinstance(h, list) else set() for h in index['collection_handles']]
+    in_collections = {
+        tipo: np.array([not h.isdisjoint(target_collections) for h in handles], dtype=bool)
+        for tipo, target_collections in get_skin_type_collection_mapping().items()
+    }
+    
+    versions = {}
+    for paso in ROUTINE_STEPS:
+        in_step = steps == paso
+        versions[(paso, None)] = {'digest': digest(in_step)}
+        for tipo, in_tipo_collections in in_collections.items():
+            in_collection = in_step & in_tipo_collections
+            versions[(paso, tipo)] = {
+                'digest': digest(in_collection),
+                'has_available': bool((in_collection & available).any()),
+                'has_available_vegan': bool((in_collection & available & vegan).any())
+            }
+    return versions
+
+def recommendation_generation(tipo_piel, vegano):
+    """Versión del catálogo que lee una consulta: por cada paso, la colección del tipo de piel.
+    
+    Si la colección no tiene productos disponibles el filtrado cae a todo el
+    paso (ver filter_by_skin_type_collection) y se usa el digest del paso.
+    """
+    parts = []
+    for paso in ROUTINE_STEPS:
+        entry = catalog_versions.get((paso, tipo_piel))
+        if entry and (entry['has_available_vegan'] if vegano else entry['has_available']):
+            parts.append(entry['digest'])
+        else:
+            parts.append(catalog_versions.get((paso, None), {}).get('digest', ''))
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+def ensure_products_loaded():
+    """Garantiza que el catálogo esté cargado con un único cargador a la vez.
+    
+    Las peticiones concurrentes esperan al hilo que está cargando en lugar de
+    releer el archivo cada una. Si la carga falla, se aplica backoff exponencial
+    y las peticiones posteriores responden sin reintentar hasta que expire.
+    """
+    global _load_failures, _next_load_attempt
+    
+    if catalog_loaded():
+        return True
+    if time.monotonic() < _next_load_attempt:
+        return False
+    
+    with _load_lock:
+        # Otro hilo pudo haber cargado (o fallado) mientras esperábamos
+        if catalog_loaded():
+            return True
+        if time.monotonic() < _next_load_attempt:
+            return False
+        
+        if load_products_from_file() and catalog_loaded():
+            _load_failures = 0
+            _next_load_attempt = 0.0
+            return True
+        
+        _load_failures += 1
+        delay = min(LOAD_RETRY_BASE_SECONDS * 2 ** (_load_failures - 1), LOAD_RETRY_MAX_SECONDS)
+        _next_load_attempt = time.monotonic() + delay
+        print(f"⚠️ Carga fallida ({_load_failures} intentos), próximo intento en {delay}s")
+        return False
+
+# Palabras clave para categorizar (compartidas por la versión por fila y la vectorizada)
+SKIN_TYPE_KEYWORDS = {
+    'grasa': ['grasa', 'graso', 'oily', 'acne', 'acné', 'matificante', 'oil-control', 'sebum', 'sebo'],
+    'seca': ['seca', 'seco', 'dry', 'hidratante', 'nutritiva', 'nutritivo', 'moisturizing', 'nourishing'],
+    'mixta': ['mixta', 'mixto', 'combination', 'combo', 'balance', 'equilibrante'],
+    'sensible': ['sensible', 'sensitive', 'suave', 'gentle', 'delicada', 'delicado', 'calming', 'soothing'],
+    'normal': ['normal', 'todo tipo', 'all skin', 'universal', 'cualquier tipo']
+}
+ALL_SKIN_TYPES = 'normal, grasa, seca, mixta, sensible'
+
+IGNORED_PRODUCT_TYPES = ['Contorno de Ojos']
+PRODUCT_TYPE_STEPS = {
+    'Hidratante': 'hidratante',
+    'Serum': 'serum',
+    'Serum Exfoliante': 'serum',
+    'Tónico': 'tónico',
+    'Tónico Exfoliante': 'tónico',
+    'Protector Solar': 'protector solar',
+    'Limpiador Oleoso': 'limpiador oleoso',
+    'Limpiador en Espuma': 'limpiador en espuma',
+    'Esencia': 'tónico',
+    'Exfoliante': 'serum'
+}
+STEP_TAG_KEYWORDS = {
+    'limpiador oleoso': ['aceite limpiador', 'oil cleanser', 'cleansing oil'],
+    'limpiador en espuma': ['limpiador espuma', 'foam cleanser', 'gel limpiador'],
+    'tónico': ['tonico', 'tónico', 'toner', 'essence', 'esencia'],
+    'serum': ['serum', 'sérum', 'suero', 'ampoule'],
+    'hidratante': ['hidratante', 'moisturizer', 'crema hidratante'],
+    'protector solar': ['protector solar', 'sunscreen', 'spf']
+}
+EYE_KEYWORDS = ['contorno', 'eye cream', 'under eye', 'ojos', 'ojeras']
+
 def categorize_skin_type(row):
     """Categoriza tipo de piel basado en tags y tipo de producto"""
     tags_lower = str(row.get('tags_str', '')).lower()
@@ -101,21 +540,13 @@ def categorize_skin_type(row):
     
     combined_text = f"{tags_lower} {product_type_lower} {title_lower}"
     
-    skin_keywords = {
-        'grasa': ['grasa', 'graso', 'oily', 'acne', 'acné', 'matificante', 'oil-control', 'sebum', 'sebo'],
-        'seca': ['seca', 'seco', 'dry', 'hidratante', 'nutritiva', 'nutritivo', 'moisturizing', 'nourishing'],
-        'mixta': ['mixta', 'mixto', 'combination', 'combo', 'balance', 'equilibrante'],
-        'sensible': ['sensible', 'sensitive', 'suave', 'gentle', 'delicada', 'delicado', 'calming', 'soothing'],
-        'normal': ['normal', 'todo tipo', 'all skin', 'universal', 'cualquier tipo']
-    }
-    
     skin_types = []
-    for skin_type, keywords in skin_keywords.items():
+    for skin_type, keywords in SKIN_TYPE_KEYWORDS.items():
         if any(keyword in combined_text for keyword in keywords):
             skin_types.append(skin_type)
     
     if not skin_types:
-        skin_types = ['normal', 'grasa', 'seca', 'mixta', 'sensible']
+        return ALL_SKIN_TYPES
     
     return ', '.join(skin_types)
 
@@ -126,48 +557,70 @@ def categorize_product_step(row):
     title = str(row.get('title', '')).lower()
     
     # Productos a ignorar
-    if product_type in ['Contorno de Ojos']:
+    if product_type in IGNORED_PRODUCT_TYPES:
         return 'otros'
     
     # Mapeo directo
-    product_type_mapping = {
-        'Hidratante': 'hidratante',
-        'Serum': 'serum',
-        'Serum Exfoliante': 'serum',
-        'Tónico': 'tónico',
-        'Tónico Exfoliante': 'tónico',
-        'Protector Solar': 'protector solar',
-        'Limpiador Oleoso': 'limpiador oleoso',
-        'Limpiador en Espuma': 'limpiador en espuma',
-        'Esencia': 'tónico',
-        'Exfoliante': 'serum'
-    }
-    
-    if product_type in product_type_mapping:
-        return product_type_mapping[product_type]
-    
-    # Fallback por tags
-    tag_mapping = {
-        'limpiador oleoso': ['aceite limpiador', 'oil cleanser', 'cleansing oil'],
-        'limpiador en espuma': ['limpiador espuma', 'foam cleanser', 'gel limpiador'],
-        'tónico': ['tonico', 'tónico', 'toner', 'essence', 'esencia'],
-        'serum': ['serum', 'sérum', 'suero', 'ampoule'],
-        'hidratante': ['hidratante', 'moisturizer', 'crema hidratante'],
-        'protector solar': ['protector solar', 'sunscreen', 'spf']
-    }
+    if product_type in PRODUCT_TYPE_STEPS:
+        return PRODUCT_TYPE_STEPS[product_type]
     
     # Ignorar contorno de ojos
-    eye_keywords = ['contorno', 'eye cream', 'under eye', 'ojos', 'ojeras']
-    if any(keyword in tags or keyword in title for keyword in eye_keywords):
+    if any(keyword in tags or keyword in title for keyword in EYE_KEYWORDS):
         return 'otros'
     
-    for step, keywords in tag_mapping.items():
+    # Fallback por tags
+    for step, keywords in STEP_TAG_KEYWORDS.items():
         for keyword in keywords:
             if keyword in tags:
                 return step
     
     return 'otros'
 
+def _contains_any(texts, keywords):
+    """Máscara de textos que contienen alguna de las palabras (como `keyword in text`)"""
+    pattern = '|'.join(re.escape(keyword) for keyword in keywords)
+    return texts.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+
+def categorize_skin_types(df):
+    """Versión vectorizada de categorize_skin_type para todo el DataFrame"""
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+    
+    combined_text = (df['tags_str'].astype(str).str.lower() + ' ' +
+                     df['product_type'].astype(str).str.lower() + ' ' +
+                     df['title'].astype(str).str.lower())
+    matches = {skin_type: _contains_any(combined_text, keywords)
+               for skin_type, keywords in SKIN_TYPE_KEYWORDS.items()}
+    
+    skin_types = [
+        ', '.join(skin_type for skin_type, mask in matches.items() if mask[i]) or ALL_SKIN_TYPES
+        for i in range(len(df))
+    ]
+    return pd.Series(skin_types, index=df.index, dtype=object)
+
+def categorize_product_steps(df):
+    """Versión vectorizada de categorize_product_step para todo el DataFrame"""
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+    
+    product_type = df['product_type'].astype(str).str.strip()
+    tags = df['tags_str'].astype(str).str.lower()
+    title = df['title'].astype(str).str.lower()
+    
+    # Mismo orden de prioridad que categorize_product_step
+    conditions = [product_type.isin(IGNORED_PRODUCT_TYPES).to_numpy()]
+    choices = ['otros']
+    for product_type_name, step in PRODUCT_TYPE_STEPS.items():
+        conditions.append((product_type == product_type_name).to_numpy())
+        choices.append(step)
+    conditions.append(_contains_any(tags, EYE_KEYWORDS) | _contains_any(title, EYE_KEYWORDS))
+    choices.append('otros')
+    for step, keywords in STEP_TAG_KEYWORDS.items():
+        conditions.append(_contains_any(tags, keywords))
+        choices.append(step)
+    
+    return pd.Series(np.select(conditions, choices, default='otros'), index=df.index, dtype=object)
+
 def get_skin_type_collection_mapping():
     """Mapeo de tipos de piel a handles de colecciones"""
     return {
@@ -178,6 +631,16 @@ def get_skin_type_collection_mapping():
         'normal': ['piel-normal', 'todo-tipo-piel', 'all-skin-types', 'normal']
     }
 
+# Etiquetas de Shopify que indican cada preocupación
+CONCERN_TAG_KEYWORDS = {
+    'acne': ['grasa', 'sebo', 'acne', 'acné', 'comedones', 'espinillas'],
+    'manchas': ['manchas', 'pigmentación', 'pigmentacion', 'hiperpigmentación'],
+    'arrugas': ['arrugas', 'antiedad', 'anti-edad', 'antienvejecimiento'],
+    'poros': ['poros dilatados', 'poros', 'minimizador poros'],
+    'hidratacion': ['hidratación', 'hidratacion', 'deshidratación'],
+    'sensibilidad': ['sensible', 'rojeces', 'irritación', 'calmante']
+}
+
 def filter_by_skin_type_collection(df, tipo_piel):
     """Filtrar por colección según tipo de piel"""
     if not tipo_piel:
@@ -206,19 +669,10 @@ def filter_by_skin_concerns_in_tags(df, preocupaciones):
     if not preocupaciones:
         return df
     
-    concern_tag_mapping = {
-        'acne': ['grasa', 'sebo', 'acne', 'acné', 'comedones', 'espinillas'],
-        'manchas': ['manchas', 'pigmentación', 'pigmentacion', 'hiperpigmentación'],
-        'arrugas': ['arrugas', 'antiedad', 'anti-edad', 'antienvejecimiento'],
-        'poros': ['poros dilatados', 'poros', 'minimizador poros'],
-        'hidratacion': ['hidratación', 'hidratacion', 'deshidratación'],
-        'sensibilidad': ['sensible', 'rojeces', 'irritación', 'calmante']
-    }
-    
     target_tags = []
     for concern in preocupaciones:
-        if concern.lower() in concern_tag_mapping:
-            target_tags.extend(concern_tag_mapping[concern.lower()])
+        if concern.lower() in CONCERN_TAG_KEYWORDS:
+            target_tags.extend(CONCERN_TAG_KEYWORDS[concern.lower()])
     
     target_tags = list(set(target_tags))
     concern_products = []
@@ -238,45 +692,74 @@ def filter_by_skin_concerns_in_tags(df, preocupaciones):
     
     return pd.DataFrame(concern_products)
 
+def compute_base_ranking_scores(df):
+    """Parte del score que no depende de la consulta (stock, demanda, precio y disponibilidad).
+    
+    Se calcula una vez al cargar el catálogo; si el catálogo no trae datos de
+    ventas el componente de stock queda igual que antes.
+    """
+    stock = df['stock'].to_numpy(dtype=float)
+    price = df['price'].to_numpy(dtype=float)
+    available = df['available'].to_numpy(dtype=bool)
+    
+    # Stock score
+    stock_score = np.select(
+        [stock > 100, stock > 50, stock > 20, stock > 10, stock > 0],
+        [1.0, 0.9, 0.7, 0.5, 0.3],
+        default=0.0
+    )
+    
+    # Mezcla con la demanda por velocidad de ventas
+    if 'demand_score' in df.columns and df['demand_score'].max() > 0:
+        demand_score = df['demand_score'].to_numpy(dtype=float)
+        stock_score = stock_score * (1 - SALES_VELOCITY_WEIGHT) + demand_score * SALES_VELOCITY_WEIGHT
+    
+    # Price score
+    price_score = np.select(
+        [(price >= 15000) & (price <= 45000),
+         (price >= 10000) & (price <= 60000),
+         (price >= 5000) & (price <= 80000)],
+        [1.0, 0.8, 0.6],
+        default=0.4
+    )
+    
+    availability_score = available.astype(float)
+    
+    return (
+        stock_score * 0.5 +
+        price_score * 0.2 +
+        availability_score * 0.2
+    )
+
+def compute_ranking_scores(df):
+    """Calcula el score de ranking de forma vectorizada para todo el DataFrame"""
+    stock = df['stock'].to_numpy(dtype=float)
+    if 'base_ranking_score' in df.columns:
+        base_score = df['base_ranking_score'].to_numpy(dtype=float)
+    else:
+        base_score = compute_base_ranking_scores(df)
+    if 'concern_score' in df.columns:
+        concern_score = df['concern_score'].fillna(0).to_numpy(dtype=float)
+    else:
+        concern_score = np.zeros(len(df))
+    
+    return recommendation_engine.final_ranking_scores(base_score, stock, concern_score)
+
+def score_products(df):
+    """Agrega las columnas de ranking sin ordenar el DataFrame"""
+    if df.empty:
+        return df
+    
+    df['final_ranking_score'] = compute_ranking_scores(df)
+    df['has_stock'] = df['stock'] > 0
+    return df
+
 def rank_by_sales_probability_and_stock(df):
     """Ordenar por probabilidad de venta y stock"""
     if df.empty:
         return df
     
-    def calculate_ranking_score(row):
-        stock = int(row.get('stock', 0))
-        price = float(row.get('price', 0))
-        available = row.get('available', False)
-        concern_score = row.get('concern_score', 0)
-        
-        # Stock score
-        if stock > 100: stock_score = 1.0
-        elif stock > 50: stock_score = 0.9
-        elif stock > 20: stock_score = 0.7
-        elif stock > 10: stock_score = 0.5
-        elif stock > 0: stock_score = 0.3
-        else: stock_score = 0.0
-        
-        # Price score
-        if 15000 <= price <= 45000: price_score = 1.0
-        elif 10000 <= price <= 60000: price_score = 0.8
-        elif 5000 <= price <= 80000: price_score = 0.6
-        else: price_score = 0.4
-        
-        availability_score = 1.0 if available else 0.0
-        concern_bonus = min(concern_score * 0.1, 0.2)
-        
-        final_score = (
-            stock_score * 0.5 +
-            price_score * 0.2 +
-            availability_score * 0.2 +
-            concern_bonus * 0.1
-        )
-        
-        return final_score if stock > 0 else final_score * 0.1
-    
-    df['final_ranking_score'] = df.apply(calculate_ranking_score, axis=1)
-    df['has_stock'] = df['stock'] > 0
+    df = score_products(df)
     
     sort_columns = ['has_stock']
     sort_ascending = [False]
@@ -290,23 +773,145 @@ def rank_by_sales_probability_and_stock(df):
     
     return df.sort_values(by=sort_columns, ascending=sort_ascending)
 
-def apply_complete_filtering_pipeline(df, tipo_piel, preocupaciones):
+def ranking_keys(df):
+    """Clave escalar equivalente al orden (has_stock, concern_score, final_ranking_score)"""
+    has_stock = df['has_stock'].to_numpy(dtype=float)
+    if 'concern_score' in df.columns:
+        concern_score = df['concern_score'].fillna(0).to_numpy(dtype=float)
+    else:
+        concern_score = np.zeros(len(df))
+    return recommendation_engine.ranking_keys(has_stock, concern_score, df['final_ranking_score'].to_numpy(dtype=float))
+
+def select_top_options(df, k=OPTIONS_PER_STEP, distinct_vendor=False, price_band=None, cheapest=0):
+    """Selecciona las k mejores opciones sin ordenar todo el DataFrame.
+    
+    Usa selección parcial (argpartition) sobre el score precalculado y solo
+    ordena los candidatos que superan el umbral. Las opciones tienen siempre
+    product_id distintos; con distinct_vendor se prefieren marcas distintas y
+    price_band=(min, max) limita el precio de las opciones. cheapest agrega
+    al final los más baratos que no estén ya elegidos.
+    Devuelve una lista de dicts (puede tener menos de k elementos).
+    """
+    if df.empty:
+        return []
+    
+    selected = recommendation_engine.select_top(
+        ranking_keys(df),
+        df['price'].to_numpy(dtype=float),
+        df['product_id'].astype(str).to_numpy(),
+        df['vendor'].astype(str).str.strip().str.lower().to_numpy(),
+        k, distinct_vendor, price_band, cheapest
+    )
+    return [df.iloc[i].to_dict() for i in selected]
+
+def candidate_ranking_keys(candidatos):
+    """ranking_keys para una lista de productos ya seleccionados (dicts)"""
+    has_stock = np.array([bool(p.get('has_stock', False)) for p in candidatos], dtype=bool)
+    concern_score = np.nan_to_num(np.array([p.get('concern_score', 0) for p in candidatos], dtype=float))
+    final_score = np.array([p.get('final_ranking_score', 0) for p in candidatos], dtype=float)
+    return recommendation_engine.ranking_keys(has_stock, concern_score, final_score).tolist()
+
+def optimize_routine_under_budget(candidatos_por_paso, presupuesto, excluir=None):
+    """Elige un producto por paso maximizando el score total sin superar el presupuesto.
+    
+    Branch-and-bound sobre las listas de candidatos de cada paso (se ordenan
+    por score descendente, la selección con diversidad de marca no las deja
+    así): se poda por precio mínimo de los pasos restantes y por el mejor
+    score alcanzable. excluir es una combinación (product_ids por paso) que
+    no se acepta como resultado. Devuelve la lista de productos elegidos o
+    None si ninguna combinación cabe en el presupuesto.
+    """
+    pasos = [
+        sorted(zip(candidate_ranking_keys(candidatos), (float(p.get('price', 0)) for p in candidatos), candidatos),
+               key=lambda candidato: -candidato[0])
+        for candidatos in candidatos_por_paso
+    ]
+    if not pasos or any(not candidatos for candidatos in pasos):
+        return None
+    
+    # Cotas acumuladas desde cada paso hasta el final
+    n = len(pasos)
+    best_rest = [0.0] * (n + 1)
+    min_price_rest = [0.0] * (n + 1)
+    for i in reversed(range(n)):
+        best_rest[i] = best_rest[i + 1] + max(key for key, _, _ in pasos[i])
+        min_price_rest[i] = min_price_rest[i + 1] + min(price for _, price, _ in pasos[i])
+    
+    if min_price_rest[0] > presupuesto:
+        return None
+    
+    best_score = float('-inf')
+    best_choice = None
+    choice = []
+    
+    def search(i, score, cost):
+        nonlocal best_score, best_choice
+        if i == n:
+            if excluir is not None and [str(p.get('product_id')) for p in choice] == excluir:
+                return
+            if score > best_score:
+                best_score = score
+                best_choice = list(choice)
+            return
+        
+        for key, price, producto in pasos[i]:
+            # Candidatos ordenados: si este no puede mejorar, los siguientes tampoco
+            if score + key + best_rest[i + 1] <= best_score:
+                break
+            if cost + price + min_price_rest[i + 1] > presupuesto:
+                continue
+            choice.append(producto)
+            search(i + 1, score + key, cost + price)
+            choice.pop()
+    
+    search(0, 0.0, 0.0)
+    return best_choice
+
+def build_budget_options(candidatos_por_paso, presupuesto):
+    """Construye Opción 1 y Opción 2 dentro del presupuesto.
+    
+    La Opción 2 excluye los productos de la Opción 1 en cada paso cuando hay
+    alternativas; si esa combinación no cabe en el presupuesto se toma la
+    mejor otra rutina (al menos un paso distinto). Solo repite la Opción 1
+    si no existe ninguna otra combinación válida.
+    """
+    opcion_1 = optimize_routine_under_budget(candidatos_por_paso, presupuesto)
+    if opcion_1 is None:
+        return None, None
+    
+    candidatos_alternativos = []
+    for candidatos, elegido in zip(candidatos_por_paso, opcion_1):
+        otros = [p for p in candidatos if str(p.get('product_id')) != str(elegido.get('product_id'))]
+        candidatos_alternativos.append(otros or [elegido])
+    
+    opcion_2 = optimize_routine_under_budget(candidatos_alternativos, presupuesto)
+    if opcion_2 is None:
+        elegidos = [str(p.get('product_id')) for p in opcion_1]
+        opcion_2 = optimize_routine_under_budget(candidatos_por_paso, presupuesto, excluir=elegidos)
+    return opcion_1, opcion_2 or opcion_1
+
+def apply_complete_filtering_pipeline(df, tipo_piel, preocupaciones, sort=True):
     """Pipeline completo de filtrado"""
     step1_filtered = filter_by_skin_type_collection(df, tipo_piel)
     step2_filtered = filter_by_skin_concerns_in_tags(step1_filtered, preocupaciones)
+    if not sort:
+        return score_products(step2_filtered), None
     final_ranked = rank_by_sales_probability_and_stock(step2_filtered)
     return final_ranked, None
 
-def filter_products_by_step(base_filtered, paso, preocupaciones, tipo_piel):
+def filter_products_by_step(base_filtered, paso, preocupaciones, tipo_piel, sort=True):
     """Filtra productos por paso específico"""
     try:
-        base_filtered['step_category'] = base_filtered.apply(categorize_product_step, axis=1)
-        step_filtered = base_filtered[base_filtered['step_category'] == paso].copy()
+        if 'step_category' in base_filtered.columns:
+            step_categories = base_filtered['step_category']
+        else:
+            step_categories = base_filtered.apply(categorize_product_step, axis=1)
+        step_filtered = base_filtered[step_categories == paso].copy()
         
         if len(step_filtered) == 0:
             return step_filtered, None
         
-        final_filtered, error = apply_complete_filtering_pipeline(step_filtered, tipo_piel, preocupaciones)
+        final_filtered, error = apply_complete_filtering_pipeline(step_filtered, tipo_piel, preocupaciones, sort=sort)
         return final_filtered, error
         
     except Exception as e:
@@ -332,14 +937,23 @@ def validate_user_responses(respuestas_usuario):
     if not isinstance(respuestas_usuario.get("vegano"), bool):
         return False, "El campo 'vegano' debe ser un valor booleano"
 
+    presupuesto = respuestas_usuario.get("presupuesto")
+    if presupuesto is not None:
+        # json acepta NaN e Infinity, que pasan la comparación con 0
+        if (isinstance(presupuesto, bool) or not isinstance(presupuesto, (int, float))
+                or not math.isfinite(presupuesto) or presupuesto <= 0):
+            return False, "El campo 'presupuesto' debe ser un número positivo"
+
     return True, "Datos válidos"
 
 def create_product_option(producto, paso):
-    """Crea un objeto de opción de producto con imagen incluida"""
+    """Crea un objeto de opción de producto con imagen incluida.
+    
+    Las URLs de imagen ya vienen normalizadas desde la carga; "imagenes" trae
+    las variantes de tamaño del CDN para las tarjetas del quiz.
+    """
     try:
-        imagen_url = str(producto.get("imagen_url", ""))
-        if imagen_url in ['nan', 'None', 'null']:
-            imagen_url = ""
+        imagen_url = producto.get("imagen_url", "")
         
         return {
             "paso": paso.replace('_', ' ').title(),
@@ -347,6 +961,7 @@ def create_product_option(producto, paso):
             "precio": float(producto.get("precio", 0)),
             "url": str(producto.get("url", "")),
             "imagen_url": imagen_url,
+            "imagenes": {f"{width}x": producto.get(f"imagen_url_{width}x", imagen_url) for width in IMAGE_VARIANT_WIDTHS},
             "product_id": str(producto.get("product_id", ""))
         }
     except Exception as e:
@@ -356,10 +971,111 @@ def create_product_option(producto, paso):
             "precio": 0,
             "url": "",
             "imagen_url": "",
+            "imagenes": {},
             "product_id": "",
             "error": str(e)
         }
 
+def build_recommendations(tipo_piel, preocupaciones, vegano, presupuesto=None):
+    """Construye las rutinas recomendadas a partir de respuestas ya validadas.
+    
+    Con el motor NumPy los filtros y la selección se resuelven sobre los
+    arreglos compilados en la carga; el resultado es el mismo que con pandas.
+    """
+    compiled = compiled_catalog
+    if compiled is not None:
+        total_base = compiled.base_count[bool(vegano)]
+        filtrar_paso = lambda paso: (compiled.match_step(vegano, paso, tipo_piel, preocupaciones), None)
+        seleccionar = compiled.select_top_options
+    else:
+        # Se trabaja por producto: cada fila es la mejor variante disponible
+        base_filtrada = products_index[products_index['available'] == True].copy()
+        
+        if vegano:
+            mask_vegano = base_filtrada["etiquetas_shopify"].str.contains(
+                recommendation_engine.VEGAN_PATTERN, case=False, na=False
+            )
+            base_filtrada = base_filtrada[mask_vegano]
+        
+        total_base = len(base_filtrada)
+        filtrar_paso = lambda paso: filter_products_by_step(base_filtrada, paso, preocupaciones, tipo_piel, sort=False)
+        seleccionar = select_top_options
+    
+    if total_base == 0:
+        return None, "No se encontraron productos que coincidan con los criterios especificados"
+    
+    print(f"Productos después de filtros base: {total_base}")
+    
+    # CONSTRUIR RESULTADO MANTENIENDO EL ORDEN
+    resultado_ordenado = {}
+    
+    # Los pasos se repiten entre rutinas: filtrar cada uno una sola vez
+    matches_por_paso = {}
+    candidatos_k = BUDGET_CANDIDATES_PER_STEP if presupuesto else OPTIONS_PER_STEP
+    candidatos_baratos = BUDGET_CHEAPEST_PER_STEP if presupuesto else 0
+    
+    for nombre_rutina, pasos_en_rutina in RUTINAS_ORDENADAS:
+        print(f"\n=== PROCESANDO {nombre_rutina.upper()} ===")
+        candidatos_por_paso = []
+        todos_los_pasos_tienen_opciones = True
+        mensaje_no_disponible = "No hay suficientes productos disponibles para esta rutina en este momento."
+        
+        for paso in pasos_en_rutina:
+            print(f"Procesando paso: {paso}")
+            if paso not in matches_por_paso:
+                matches_por_paso[paso] = filtrar_paso(paso)
+            match, step_error = matches_por_paso[paso]
+            
+            if step_error or len(match) == 0:
+                print(f"No se encontraron productos para {paso}")
+                todos_los_pasos_tienen_opciones = False
+                break
+            
+            print(f"Productos encontrados para {paso}: {len(match)}")
+            
+            opciones = seleccionar(
+                match,
+                k=candidatos_k,
+                distinct_vendor=DIVERSIFY_VENDORS,
+                price_band=ROUTINE_PRICE_BANDS.get(nombre_rutina),
+                cheapest=candidatos_baratos
+            )
+            
+            if not opciones:
+                todos_los_pasos_tienen_opciones = False
+                break
+            
+            candidatos_por_paso.append(opciones)
+        
+        combinacion_1 = combinacion_2 = None
+        if todos_los_pasos_tienen_opciones and candidatos_por_paso:
+            if presupuesto:
+                combinacion_1, combinacion_2 = build_budget_options(candidatos_por_paso, presupuesto)
+                if combinacion_1 is None:
+                    mensaje_no_disponible = "No hay combinaciones de productos para esta rutina dentro del presupuesto indicado."
+            else:
+                # Con un único producto disponible se repite en ambas opciones
+                combinacion_1 = [opciones[0] for opciones in candidatos_por_paso]
+                combinacion_2 = [opciones[1] if len(opciones) > 1 else opciones[0] for opciones in candidatos_por_paso]
+        
+        # AGREGAR AL RESULTADO EN EL ORDEN CORRECTO
+        if combinacion_1:
+            resultado_ordenado[nombre_rutina] = {
+                "Opción 1": [create_product_option(p, paso) for p, paso in zip(combinacion_1, pasos_en_rutina)],
+                "Opción 2": [create_product_option(p, paso) for p, paso in zip(combinacion_2, pasos_en_rutina)]
+            }
+            print(f"✅ {nombre_rutina} completada con {len(combinacion_1)} pasos")
+        else:
+            resultado_ordenado[nombre_rutina] = {
+                "No disponible": [{
+                    "paso": "Información",
+                    "nombre": mensaje_no_disponible
+                }]
+            }
+            print(f"❌ {nombre_rutina} no disponible")
+    
+    return resultado_ordenado, None
+
 def get_recommendations(respuestas_usuario):
     """Función principal para generar recomendaciones CON ORDEN GARANTIZADO"""
     try:
@@ -370,81 +1086,32 @@ def get_recommendations(respuestas_usuario):
         tipo_piel = respuestas_usuario.get("tipo_piel", "").lower().strip()
         preocupaciones = [p.lower().strip() for p in respuestas_usuario.get("preocupaciones", []) if p.strip()]
         vegano = respuestas_usuario.get("vegano", False)
+        presupuesto = respuestas_usuario.get("presupuesto")
         
         print(f"=== PROCESANDO RECOMENDACIONES ===")
         print(f"Tipo de piel: {tipo_piel}")
         print(f"Preocupaciones: {preocupaciones}")
         print(f"Vegano: {vegano}")
+        print(f"Presupuesto: {presupuesto}")
         
-        base_filtrada = products_df[products_df['available'] == True].copy()
-        
-        if vegano:
-            mask_vegano = base_filtrada["etiquetas_shopify"].str.contains("vegano|vegan", case=False, na=False)
-            base_filtrada = base_filtrada[mask_vegano]
-        
-        if base_filtrada.empty:
-            return None, "No se encontraron productos que coincidan con los criterios especificados"
-        
-        print(f"Productos después de filtros base: {len(base_filtrada)}")
-        
-        # RUTINAS EN ORDEN ESPECÍFICO USANDO LISTA
-        rutinas_ordenadas = [
-            ("Rutina Básica", ["limpiador en espuma", "hidratante", "protector solar"]),
-            ("Rutina Intermedia", ["limpiador en espuma", "tónico", "serum", "hidratante", "protector solar"]),
-            ("Rutina Completa", ["limpiador oleoso", "limpiador en espuma", "tónico", "serum", "hidratante", "protector solar"])
-        ]
-        
-        # CONSTRUIR RESULTADO MANTENIENDO EL ORDEN
-        resultado_ordenado = {}
+        params = {
+            "tipo_piel": tipo_piel,
+            "preocupaciones": sorted(set(preocupaciones)),
+            "vegano": vegano,
+            "presupuesto": presupuesto,
+            "config": [OPTIONS_PER_STEP, DIVERSIFY_VENDORS, ROUTINE_PRICE_BANDS, BUDGET_CANDIDATES_PER_STEP,
+                       BUDGET_CHEAPEST_PER_STEP]
+        }
+        cache_key = recommendation_cache.make_key(
+            f"recomendaciones-v{RECOMMENDATION_CACHE_VERSION}", recommendation_generation(tipo_piel, vegano), params
+        )
         
-        for nombre_rutina, pasos_en_rutina in rutinas_ordenadas:
-            print(f"\n=== PROCESANDO {nombre_rutina.upper()} ===")
-            opciones_rutina_1 = []
-            opciones_rutina_2 = []
-            todos_los_pasos_tienen_opciones = True
-            
-            for paso in pasos_en_rutina:
-                print(f"Procesando paso: {paso}")
-                match, step_error = filter_products_by_step(base_filtrada, paso, preocupaciones, tipo_piel)
-                
-                if step_error or match.empty:
-                    print(f"No se encontraron productos para {paso}")
-                    todos_los_pasos_tienen_opciones = False
-                    break
-                
-                print(f"Productos encontrados para {paso}: {len(match)}")
-                
-                if len(match) >= 2:
-                    producto_opcion_1 = match.iloc[0].to_dict()
-                    producto_opcion_2 = match.iloc[1].to_dict()
-                    
-                    opciones_rutina_1.append(create_product_option(producto_opcion_1, paso))
-                    opciones_rutina_2.append(create_product_option(producto_opcion_2, paso))
-                elif len(match) == 1:
-                    producto = match.iloc[0].to_dict()
-                    opciones_rutina_1.append(create_product_option(producto, paso))
-                    opciones_rutina_2.append(create_product_option(producto, paso))
-                else:
-                    todos_los_pasos_tienen_opciones = False
-                    break
-            
-            # AGREGAR AL RESULTADO EN EL ORDEN CORRECTO
-            if todos_los_pasos_tienen_opciones and opciones_rutina_1:
-                resultado_ordenado[nombre_rutina] = {
-                    "Opción 1": opciones_rutina_1,
-                    "Opción 2": opciones_rutina_2
-                }
-                print(f"✅ {nombre_rutina} completada con {len(opciones_rutina_1)} pasos")
-            else:
-                resultado_ordenado[nombre_rutina] = {
-                    "No disponible": [{
-                        "paso": "Información",
-                        "nombre": "No hay suficientes productos disponibles para esta rutina en este momento."
-                    }]
-                }
-                print(f"❌ {nombre_rutina} no disponible")
+        def compute():
+            resultado, error = build_recommendations(tipo_piel, preocupaciones, vegano, presupuesto)
+            return {"resultado": resultado, "error": error}
         
-        return resultado_ordenado, None
+        cached = recommendation_cache.get_or_compute(cache_backend, cache_key, compute)
+        return cached["resultado"], cached["error"]
         
     except Exception as e:
         print(f"❌ Error en get_recommendations: {str(e)}")
@@ -453,7 +1120,7 @@ def get_recommendations(respuestas_usuario):
         return None, f"Error inesperado en get_recommendations: {str(e)}"
 
 # ENDPOINTS
-@app.route("/apps/skincare-recommender/recomendar", methods=["POST", "OPTIONS"])
+@bp.route("/apps/skincare-recommender/recomendar", methods=["POST", "OPTIONS"])
 def recomendar_endpoint():
     if request.method == "OPTIONS":
         response = make_response()
@@ -471,10 +1138,8 @@ def recomendar_endpoint():
         if not respuestas_usuario:
             return jsonify({"error": "No se recibieron datos JSON válidos"}), 400
         
-        if products_df.empty:
-            load_products_from_file()
-            if products_df.empty:
-                return jsonify({"error": "No hay productos disponibles en este momento"}), 503
+        if not ensure_products_loaded():
+            return jsonify({"error": "No hay productos disponibles en este momento"}), 503
         
         recomendaciones, error = get_recommendations(respuestas_usuario)
         
@@ -486,72 +1151,109 @@ def recomendar_endpoint():
     except Exception as e:
         return jsonify({"error": f"Error interno del servidor: {str(e)}"}), 500
 
-@app.route("/health", methods=["GET"])
+@bp.route("/health", methods=["GET"])
 def health_check():
-    """Endpoint de salud"""
+    """Endpoint de salud (liveness): el proceso responde"""
     return jsonify({
         "status": "healthy",
-        "products_loaded": len(products_df),
+        "products_loaded": len(products_df) if catalog_loaded() else 0,
         "last_update": last_update.isoformat() if last_update else None
     })
 
-@app.route("/api/debug/images", methods=["GET"])
+@bp.route("/ready", methods=["GET"])
+def readiness_check():
+    """Endpoint de disponibilidad (readiness): el catálogo está cargado"""
+    ready = ensure_products_loaded()
+    body = {
+        "status": "ready" if ready else "loading",
+        "products_loaded": len(products_df) if catalog_loaded() else 0,
+        "unique_products": len(products_index) if catalog_loaded() else 0,
+        "last_update": last_update.isoformat() if last_update else None
+    }
+    if not ready:
+        body["load_failures"] = _load_failures
+        body["retry_in_seconds"] = round(max(_next_load_attempt - time.monotonic(), 0), 1)
+        return jsonify(body), 503
+    return jsonify(body)
+
+@bp.route("/api/debug/images", methods=["GET"])
 def debug_images():
-    """Debug específico para verificar las imágenes"""
-    try:
-        if products_df.empty:
-            return jsonify({"error": "No hay productos cargados"}), 404
-        
-        total_products = len(products_df)
-        with_images = products_df[products_df['imagen_url'] != ''].shape[0]
-        without_images = total_products - with_images
-        
-        # Ejemplos
-        products_with_images = products_df[products_df['imagen_url'] != ''].head(5)
-        examples_with_images = products_with_images[['title', 'imagen_url', 'product_type']].to_dict('records')
-        
-        products_without_images = products_df[products_df['imagen_url'] == ''].head(5)
-        examples_without_images = products_without_images[['title', 'imagen_url', 'product_type']].to_dict('records')
-        
-        return jsonify({
-            "total_products": total_products,
-            "products_with_images": with_images,
-            "products_without_images": without_images,
-            "percentage_with_images": round((with_images / total_products * 100), 2) if total_products > 0 else 0,
-            "examples_with_images": examples_with_images,
-            "examples_without_images": examples_without_images,
-            "sample_image_urls": products_df[products_df['imagen_url'] != '']['imagen_url'].head(3).tolist()
-        })
-        
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    """Debug específico para verificar las imágenes (stats calculadas en la carga)"""
+    if not catalog_loaded():
+        return jsonify({"error": "No hay productos cargados"}), 404
+    
+    return jsonify(image_stats)
+
+@bp.route("/api/reload", methods=["POST"])
+def reload_catalog():
+    """Recarga el catálogo en el worker que atiende la petición (requiere RELOAD_TOKEN).
+    
+    Cada worker de gunicorn tiene su propia copia: quien recarga todos debe
+    repetir la llamada hasta ver cada worker_pid con la nueva generación.
+    """
+    if not RELOAD_TOKEN:
+        return jsonify({"error": "No encontrado"}), 404
+    token = request.headers.get("X-Reload-Token", "")
+    if not hmac.compare_digest(token.encode("utf-8"), RELOAD_TOKEN.encode("utf-8")):
+        return jsonify({"error": "Token inválido"}), 403
+    
+    start = time.perf_counter()
+    with _load_lock:
+        loaded = load_products_from_file()
+    body = {
+        "status": "reloaded" if loaded else "error",
+        "worker_pid": os.getpid(),
+        "catalog_generation": catalog_generation,
+        "products_loaded": len(products_df) if catalog_loaded() else 0,
+        "load_seconds": round(time.perf_counter() - start, 3)
+    }
+    return jsonify(body), 200 if loaded else 500
 
 def auto_update_products():
     """Actualización automática de productos"""
     while True:
         try:
             print("Actualizando productos automáticamente...")
-            os.system("python shopify_sync.py")
-            load_products_from_file()
+            os.system("python -m catalog_sync full")
+            with _load_lock:
+                load_products_from_file()
         except Exception as e:
             print(f"Error en actualización automática: {e}")
         
         time.sleep(UPDATE_INTERVAL)
 
 # INICIALIZACIÓN
-print("=== INICIANDO APLICACIÓN ===")
-print(f"Directorio de trabajo: {os.getcwd()}")
-
-load_products_from_file()
+def create_app(load_catalog=False):
+    """Crea la aplicación Flask.
+    
+    Importar el módulo no carga el catálogo: con load_catalog=True se carga
+    aquí (gunicorn.conf.py lo hace en el master antes del fork, así los
+    workers comparten la memoria por copy-on-write); si no, la primera
+    petición a /ready o /recomendar lo carga.
+    """
+    print("=== INICIANDO APLICACIÓN ===")
+    print(f"Directorio de trabajo: {os.getcwd()}")
+    
+    flask_app = Flask(__name__)
+    CORS(flask_app, origins=['*'])
+    flask_app.register_blueprint(bp)
+    
+    if load_catalog:
+        ensure_products_loaded()
+    
+    # Thread de actualización comentado temporalmente
+    # if not update_thread or not update_thread.is_alive():
+    #     update_thread = threading.Thread(target=auto_update_products, daemon=True)
+    #     update_thread.start()
+    #     print("✅ Thread de actualización automática iniciado")
+    
+    return flask_app
 
-# Thread de actualización comentado temporalmente
-# if not update_thread or not update_thread.is_alive():
-#     update_thread = threading.Thread(target=auto_update_products, daemon=True)
-#     update_thread.start()
-#     print("✅ Thread de actualización automática iniciado")
+app = create_app()
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     print(f"=== INICIANDO EN PUERTO {port} ===")
-    print(f"Productos cargados: {len(products_df)}")
+    ensure_products_loaded()
+    print(f"Productos cargados: {len(products_df) if catalog_loaded() else 0}")
     app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
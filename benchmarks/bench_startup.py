@@ -0,0 +1,228 @@
+"""Benchmark de arranque del proceso web.
+
+Mide tres cosas para el directorio de la app indicado:
+  1. Perfil de imports (python -X importtime -c "import app"): tiempo total y
+     los módulos más caros importados por app.py.
+  2. Tiempo de import + carga del catálogo en un proceso aislado.
+  3. gunicorn real: tiempo hasta la primera respuesta 200 de /health y de
+     /ready, y memoria (RSS y PSS) del master y los workers, con y sin
+     preload en el master.
+
+--app-dir permite correr el mismo benchmark sobre otro checkout (p.ej. una
+versión anterior) para comparar.
+
+Uso:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --catalog /ruta/shopify_products.json --workers 4 --json arranque.json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOAD_SCRIPT = """
+import json, time, contextlib, io
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+    imported = time.perf_counter()
+    if hasattr(app, 'ensure_products_loaded'):
+        app.ensure_products_loaded()
+loaded = time.perf_counter()
+print(json.dumps({'import_seconds': imported - start, 'load_seconds': loaded - imported,
+                  'products': len(app.products_df) if app.products_df is not None else 0}))
+"""
+
+def app_env(cache_dir, catalog=None, extra=None):
+    """Entorno de la app con la caché en cache_dir (lo limpia quien lo crea)"""
+    env = dict(os.environ)
+    env['CACHE_DIR'] = cache_dir
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    if catalog:
+        env['PRODUCTS_FILE'] = os.path.abspath(catalog)
+    env.update(extra or {})
+    return env
+
+def profile_imports(app_dir, env, top=10):
+    """Parsea -X importtime: devuelve el total de `import app` y los imports más caros de app.py"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=app_dir, env=env, capture_output=True, text=True)
+    modules = []
+    total = None
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        cumulative_us = int(cumulative_us)
+        indent = len(name) - len(name.lstrip())
+        name = name.strip()
+        if name == 'app' and indent <= 1:
+            total = cumulative_us / 1e6
+        elif indent == 3:
+            # Imports directos de app.py (un nivel de anidamiento)
+            modules.append((name, cumulative_us / 1e6))
+    modules.sort(key=lambda x: x[1], reverse=True)
+    return {
+        'import_app_seconds': round(total, 3) if total is not None else None,
+        'top_imports': [{'module': name, 'seconds': round(seconds, 3)} for name, seconds in modules[:top]],
+    }
+
+def measure_load(app_dir, env):
+    result = subprocess.run([sys.executable, '-c', LOAD_SCRIPT], cwd=app_dir, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    return {key: round(value, 3) if isinstance(value, float) else value for key, value in data.items()}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def http_status(url, timeout=5):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            if int(fields[1]) == pid:
+                children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return children
+
+def memory_kb(pid):
+    """RSS y PSS (la parte proporcional de las páginas compartidas) de un proceso"""
+    memory = {'rss_kb': 0, 'pss_kb': 0}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Rss:'):
+                    memory['rss_kb'] = int(line.split()[1])
+                elif line.startswith('Pss:'):
+                    memory['pss_kb'] = int(line.split()[1])
+    except OSError:
+        pass
+    return memory
+
+def measure_gunicorn(app_dir, env, workers, preload, timeout=120):
+    """Arranca gunicorn y mide hasta la primera respuesta sana de /health y /ready"""
+    port = free_port()
+    env = dict(env, GUNICORN_PRELOAD='true' if preload else 'false')
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(workers), '--log-level', 'warning']
+    if preload:
+        command.append('--preload')
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=app_dir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    timings = {}
+    try:
+        deadline = start + timeout
+        while time.perf_counter() < deadline and len(timings) < 2:
+            if process.poll() is not None:
+                raise RuntimeError(f'gunicorn terminó con código {process.returncode}')
+            for path in ('health', 'ready'):
+                if path not in timings and http_status(f'http://127.0.0.1:{port}/{path}') == 200:
+                    timings[path] = time.perf_counter() - start
+            time.sleep(0.01)
+
+        # Todos los workers deben estar arriba y listos antes de medir memoria
+        while time.perf_counter() < deadline and len(child_pids(process.pid)) < workers:
+            time.sleep(0.05)
+        for _ in range(workers * 4):
+            http_status(f'http://127.0.0.1:{port}/ready', timeout=timeout)
+
+        workers_memory = [memory_kb(pid) for pid in child_pids(process.pid)]
+        master_memory = memory_kb(process.pid)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    return {
+        'mode': 'preload' if preload else 'no-preload',
+        'first_health_seconds': round(timings['health'], 3) if 'health' in timings else None,
+        'first_ready_seconds': round(timings['ready'], 3) if 'ready' in timings else None,
+        'master_rss_mb': round(master_memory['rss_kb'] / 1024, 1),
+        'workers_rss_mb': [round(m['rss_kb'] / 1024, 1) for m in workers_memory],
+        'total_pss_mb': round((master_memory['pss_kb'] + sum(m['pss_kb'] for m in workers_memory)) / 1024, 1),
+    }
+
+def median_run(runs):
+    """Corrida con la mediana de tiempo hasta /ready"""
+    runs = sorted(runs, key=lambda r: r['first_ready_seconds'] or float('inf'))
+    result = dict(runs[len(runs) // 2])
+    result['first_ready_all'] = [r['first_ready_seconds'] for r in runs]
+    result['first_health_median'] = statistics.median(r['first_health_seconds'] or 0 for r in runs)
+    return result
+
+def print_report(imports, load, servers):
+    print(f"\n📦 import app: {imports['import_app_seconds']}s")
+    for item in imports['top_imports']:
+        print(f"   {item['module']:>24}: {item['seconds']}s")
+
+    print(f"\n⏱️ Proceso aislado: import {load['import_seconds']}s + carga {load['load_seconds']}s "
+          f"({load['products']} variantes)")
+
+    print(f"\n{'modo':>12} {'/health(s)':>11} {'/ready(s)':>10} {'master(MB)':>11} {'workers RSS(MB)':>22} {'PSS total(MB)':>14}")
+    for r in servers:
+        print(f"{r['mode']:>12} {str(r['first_health_seconds']):>11} {str(r['first_ready_seconds']):>10} "
+              f"{r['master_rss_mb']:>11} {str(r['workers_rss_mb']):>22} {r['total_pss_mb']:>14}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de arranque del proceso web')
+    parser.add_argument('--app-dir', default=ROOT, help='Directorio con app.py (por defecto este repo)')
+    parser.add_argument('--catalog', help='Archivo de productos (PRODUCTS_FILE); por defecto el del directorio')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--modes', default='preload,no-preload', help='preload, no-preload o ambos')
+    parser.add_argument('--repeat', type=int, default=3, help='Arranques de gunicorn por modo (se reporta la mediana)')
+    parser.add_argument('--json', help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_startup_cache_') as cache_dir:
+        env = app_env(cache_dir, args.catalog)
+        print(f"🔎 Perfilando imports en {args.app_dir}...")
+        imports = profile_imports(args.app_dir, env)
+        load = measure_load(args.app_dir, env)
+
+        servers = []
+        for mode in args.modes.split(','):
+            print(f"🚀 gunicorn {mode} con {args.workers} workers ({args.repeat} arranques)...")
+            runs = [measure_gunicorn(args.app_dir, env, args.workers, preload=(mode == 'preload'))
+                    for _ in range(args.repeat)]
+            servers.append(median_run(runs))
+
+    print_report(imports, load, servers)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'imports': imports, 'load': load, 'servers': servers}, f, ensure_ascii=False, indent=2)
+        print(f"💾 Resultados guardados en {args.json}")
+
+if __name__ == '__main__':
+    main()
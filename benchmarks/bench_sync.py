@@ -0,0 +1,163 @@
+"""Benchmark de sincronización contra el Shopify simulado (benchmarks/mock_shopify.py).
+
+Ejecuta catalog_sync.sync_full para cada tamaño de catálogo y reporta llamadas
+a la API, tiempo total, memoria pico, registros por segundo y el tiempo de cada
+paso, además de cómo escala cada paso entre el tamaño más chico y el más grande.
+Colecciones, productos y ventas corren en paralelo, así que sus tiempos se
+superponen.
+
+Uso:
+    python -m benchmarks.bench_sync
+    python -m benchmarks.bench_sync --sizes 1000x5000,10000x100000 --latency-ms 20 --concurrency 8 --json resultados.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog_sync import ShopifyClient, sync
+from benchmarks.mock_shopify import MockShopifyServer, MockShopifyStore
+
+# Pasos instrumentados de catalog_sync.sync (el armado de registros y la
+# escritura del archivo quedan en "resto")
+TIMED_STEPS = {
+    'colecciones': 'fetch_collections',
+    'productos': 'fetch_products',
+    'ventas': 'fetch_sales',
+    'membresias': 'fetch_memberships',
+}
+
+def parse_sizes(value):
+    sizes = []
+    for item in value.split(','):
+        products, orders = item.lower().split('x')
+        sizes.append((int(products), int(orders)))
+    return sizes
+
+@contextlib.contextmanager
+def timed_steps(timings):
+    """Envuelve las funciones de cada paso para medir su duración"""
+    originals = {}
+    for step, name in TIMED_STEPS.items():
+        original = getattr(sync, name)
+        originals[name] = original
+
+        def wrapper(*args, _step=step, _original=original, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _original(*args, **kwargs)
+            finally:
+                timings[_step] = timings.get(_step, 0.0) + time.perf_counter() - start
+
+        setattr(sync, name, wrapper)
+    try:
+        yield
+    finally:
+        for name, original in originals.items():
+            setattr(sync, name, original)
+
+def run_sync(server, measure_memory=True, concurrency=None):
+    """Corre una sincronización completa en un directorio temporal"""
+    timings = {}
+    server.reset_stats()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            if measure_memory:
+                tracemalloc.start()
+            start = time.perf_counter()
+            with ShopifyClient(api_url=server.url, access_token='benchmark-token', concurrency=concurrency) as client, \
+                    timed_steps(timings), contextlib.redirect_stdout(io.StringIO()):
+                records = sync.sync_full(client=client)
+            wall = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if measure_memory else None
+        finally:
+            if measure_memory:
+                tracemalloc.stop()
+            os.chdir(cwd)
+
+    if records is None:
+        raise RuntimeError('La sincronización falló contra el servidor simulado')
+
+    # Los tres primeros pasos corren en paralelo: cuenta el más lento
+    parallel = max(timings.get(step, 0.0) for step in ('colecciones', 'productos', 'ventas'))
+    timings['resto'] = max(wall - parallel - timings.get('membresias', 0.0), 0.0)
+    return {
+        'records': len(records),
+        'wall_seconds': round(wall, 3),
+        'records_per_second': round(len(records) / wall, 1) if wall else None,
+        'peak_memory_mb': round(peak / 1024 / 1024, 1) if peak is not None else None,
+        'api_calls': server.stats['requests'],
+        'api_calls_by_endpoint': dict(server.stats['by_endpoint']),
+        'throttled': server.stats['throttled'],
+        'steps': {step: round(seconds, 3) for step, seconds in timings.items()},
+    }
+
+def print_report(results):
+    print(f"\n{'productos':>10} {'órdenes':>8} {'registros':>9} {'llamadas':>8} {'429':>5} "
+          f"{'tiempo(s)':>9} {'reg/s':>8} {'mem(MB)':>8}")
+    for r in results:
+        print(f"{r['products']:>10} {r['orders']:>8} {r['records']:>9} {r['api_calls']:>8} {r['throttled']:>5} "
+              f"{r['wall_seconds']:>9} {r['records_per_second']:>8} {str(r['peak_memory_mb']):>8}")
+
+    print("\n⏱️ Tiempo por paso (s):")
+    steps = list(results[0]['steps'])
+    print(f"{'paso':>12} " + ' '.join(f"{r['products']}x{r['orders']:>0}".rjust(14) for r in results))
+    for step in steps:
+        print(f"{step:>12} " + ' '.join(f"{r['steps'][step]:>14}" for r in results))
+
+    if len(results) > 1:
+        first, last = results[0], results[-1]
+        print(f"\n📈 Escalamiento {first['products']}x{first['orders']} → {last['products']}x{last['orders']}:")
+        print(f"   productos x{last['products'] / first['products']:.1f}, órdenes x{last['orders'] / max(first['orders'], 1):.1f}")
+        for step in steps:
+            base = first['steps'][step]
+            ratio = last['steps'][step] / base if base else float('inf')
+            print(f"   {step:>12}: x{ratio:.1f}")
+        for endpoint, calls in sorted(last['api_calls_by_endpoint'].items()):
+            base = first['api_calls_by_endpoint'].get(endpoint, 0)
+            print(f"   llamadas {endpoint:>20}: {base} → {calls}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de sincronización con Shopify simulado')
+    parser.add_argument('--sizes', default='1000x5000,10000x100000',
+                        help='Lista de PRODUCTOSxÓRDENES separada por comas')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latencia por petición del servidor simulado')
+    parser.add_argument('--rate-limit', action='store_true', help='Activa 429 con leaky bucket (40 llamadas, 2/s)')
+    parser.add_argument('--concurrency', type=int, default=None, help='Conexiones simultáneas (SYNC_CONCURRENCY)')
+    parser.add_argument('--no-memory', action='store_true', help='No medir memoria pico (tracemalloc agrega overhead)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    results = []
+    for products, orders in parse_sizes(args.sizes):
+        print(f"🏗️ Generando catálogo simulado: {products} productos, {orders} órdenes...")
+        store = MockShopifyStore(products, orders, seed=args.seed)
+        with MockShopifyServer(store, latency=args.latency_ms / 1000, rate_limit=args.rate_limit) as server:
+            print(f"🚀 Sincronizando contra {server.url}")
+            result = run_sync(server, measure_memory=not args.no_memory, concurrency=args.concurrency)
+        result.update({'products': products, 'orders': orders})
+        results.append(result)
+        print(f"   ✅ {result['records']} registros en {result['wall_seconds']}s")
+
+    print_report(results)
+    print(f"\nRSS máximo del proceso: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 Resultados guardados en {args.json}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Verifica que el motor NumPy y el pipeline con pandas den el mismo resultado.
+
+Carga el catálogo una vez y corre build_recommendations con ambos motores
+sobre respuestas aleatorias (tipos de piel y preocupaciones conocidos y
+desconocidos, vegano, presupuestos, diversidad de marca, bandas de precio y
+opciones por paso). Termina con código 1 ante la primera diferencia y
+reporta el tiempo medio por consulta de cada motor.
+
+Uso:
+    python -m benchmarks.compare_engines
+    python -m benchmarks.compare_engines --catalog /ruta/shopify_products.json --trials 500 --seed 7
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+
+TIPOS_PIEL = ['grasa', 'seca', 'mixta', 'sensible', 'normal', '', 'desconocido']
+PRESUPUESTOS = [None, None, 1000, 20000, 60000, 110000, 150000]
+PRICE_BANDS = [{}, {'Rutina Básica': (10000, 30000), 'Rutina Completa': (None, 50000)}]
+
+def run_engine(app, compiled, query, config):
+    """build_recommendations con el motor indicado (compiled=None usa pandas)"""
+    app.compiled_catalog = compiled
+    app.DIVERSIFY_VENDORS, app.ROUTINE_PRICE_BANDS, app.OPTIONS_PER_STEP = config
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = app.build_recommendations(*query)
+        return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara el motor NumPy con el pipeline pandas')
+    parser.add_argument('--catalog', help='Archivo de productos (por defecto PRODUCTS_FILE)')
+    parser.add_argument('--trials', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+        if args.catalog:
+            app.PRODUCTS_FILE = args.catalog
+        app.RECOMMENDATION_ENGINE = 'numpy'
+        loaded = app.ensure_products_loaded()
+    if not loaded:
+        print(f"❌ No se pudo cargar {app.PRODUCTS_FILE}")
+        sys.exit(1)
+
+    compiled = app.compiled_catalog
+    concerns = list(app.CONCERN_TAG_KEYWORDS) + ['desconocida']
+    rng = random.Random(args.seed)
+    numpy_seconds = pandas_seconds = 0.0
+
+    print(f"🔎 Comparando {args.trials} consultas sobre {len(app.products_index)} productos...")
+    for trial in range(args.trials):
+        query = (rng.choice(TIPOS_PIEL), rng.sample(concerns, rng.randint(0, 3)), rng.random() < 0.3,
+                 rng.choice(PRESUPUESTOS))
+        config = (rng.random() < 0.5, rng.choice(PRICE_BANDS), rng.choice([2, 3]))
+        numpy_result, numpy_time = run_engine(app, compiled, query, config)
+        pandas_result, pandas_time = run_engine(app, None, query, config)
+        numpy_seconds += numpy_time
+        pandas_seconds += pandas_time
+
+        if json.dumps(numpy_result, sort_keys=True) != json.dumps(pandas_result, sort_keys=True):
+            print(f"❌ Diferencia en la consulta {trial}: {query} con config {config}")
+            sys.exit(1)
+
+    print(f"✅ {args.trials} consultas idénticas; por consulta: numpy {numpy_seconds / args.trials * 1000:.2f}ms, "
+          f"pandas {pandas_seconds / args.trials * 1000:.2f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,421 @@
+"""Prueba de carga offline de /apps/skincare-recommender/recomendar y /health.
+
+Levanta gunicorn localmente sobre una copia del catálogo (o usa --url), genera
+respuestas del quiz según una distribución configurable de tipo_piel,
+preocupaciones y vegano, y las envía a tasas fijas (lazo abierto: cada
+petición tiene su hora programada y la latencia se mide desde ahí, así que el
+encolamiento del cliente también cuenta). Por cada tasa reporta throughput,
+percentiles de latencia por endpoint, errores y RSS de los workers.
+
+Con --reload-at se modifica el stock de una fracción del catálogo a mitad de
+cada tasa y se recarga en todos los workers vía POST /api/reload (RELOAD_TOKEN).
+Luego se verifica que, entre recargas, las mismas respuestas del quiz den
+siempre el mismo resultado (caché y workers coherentes).
+
+Uso:
+    python -m benchmarks.load_test --rates 5,20,50 --duration 20 --workers 2
+    python -m benchmarks.load_test --rates 20 --duration 30 --reload-at 10 --profile perfil.json --json carga.json
+
+El perfil es un JSON con cualquiera de las claves de DEFAULT_PROFILE:
+    {"tipo_piel": {"grasa": 0.5, "seca": 0.5}, "preocupaciones": {"acne": 0.6}, "vegano": 0.3}
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_startup import ROOT, app_env, child_pids, free_port, http_status, memory_kb
+
+RECOMMEND_PATH = '/apps/skincare-recommender/recomendar'
+
+# tipo_piel: peso de cada tipo; preocupaciones: probabilidad independiente de
+# marcar cada una (hasta max_preocupaciones); vegano: probabilidad de True
+DEFAULT_PROFILE = {
+    'tipo_piel': {'grasa': 0.3, 'mixta': 0.25, 'seca': 0.2, 'sensible': 0.15, 'normal': 0.1},
+    'preocupaciones': {'acne': 0.35, 'manchas': 0.3, 'arrugas': 0.2, 'poros': 0.25,
+                       'hidratacion': 0.35, 'sensibilidad': 0.2},
+    'max_preocupaciones': 3,
+    'vegano': 0.15,
+}
+
+def load_profile(path):
+    profile = dict(DEFAULT_PROFILE)
+    if path:
+        with open(path, encoding='utf-8') as f:
+            profile.update(json.load(f))
+    return profile
+
+def quiz_answer(profile, rng):
+    """Respuesta del quiz muestreada del perfil"""
+    tipos = profile['tipo_piel']
+    tipo_piel = rng.choices(list(tipos), weights=list(tipos.values()))[0]
+    preocupaciones = [c for c, p in profile['preocupaciones'].items() if rng.random() < p]
+    rng.shuffle(preocupaciones)
+    return {
+        'tipo_piel': tipo_piel,
+        'preocupaciones': preocupaciones[:profile['max_preocupaciones']],
+        'vegano': rng.random() < profile['vegano'],
+    }
+
+def answer_key(answer):
+    return json.dumps([answer['tipo_piel'], sorted(answer['preocupaciones']), answer['vegano']])
+
+def send(base_url, path, body=None, headers=None, timeout=30):
+    """Una petición HTTP; devuelve (status, cuerpo) con status None si no hubo respuesta"""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, headers=headers or {},
+                                     method='POST' if data is not None else 'GET')
+    if data is not None:
+        request.add_header('Content-Type', 'application/json')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except OSError as e:
+        return None, type(e).__name__.encode()
+
+class Server:
+    """gunicorn local sobre una copia del catálogo (PRODUCTS_FILE en un directorio temporal)"""
+
+    def __init__(self, app_dir, catalog, workers, preload, cache_backend, log_path=None):
+        self.workdir = tempfile.mkdtemp(prefix='load_test_')
+        self.catalog_path = os.path.join(self.workdir, 'shopify_products.json')
+        shutil.copyfile(catalog, self.catalog_path)
+        self.token = secrets.token_hex(16)
+        self.workers = workers
+        self.port = free_port()
+        self.base_url = f'http://127.0.0.1:{self.port}'
+
+        # La caché vive dentro de workdir, que stop() elimina
+        env = app_env(os.path.join(self.workdir, 'cache'), self.catalog_path, {
+            'RELOAD_TOKEN': self.token,
+            'CACHE_BACKEND': cache_backend,
+            'GUNICORN_PRELOAD': 'true' if preload else 'false',
+        })
+        command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{self.port}',
+                   '--workers', str(workers), '--log-level', 'warning']
+        self.log = open(log_path, 'w') if log_path else subprocess.DEVNULL
+        self.process = subprocess.Popen(command, cwd=app_dir, env=env, stdout=self.log, stderr=self.log)
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def wait_ready(self, timeout=180):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'gunicorn terminó con código {self.process.returncode}')
+            if http_status(f'{self.base_url}/ready') == 200 and len(child_pids(self.pid)) >= self.workers:
+                # Cada worker sin preload carga en su primera petición
+                for _ in range(self.workers * 4):
+                    http_status(f'{self.base_url}/ready', timeout=timeout)
+                return
+            time.sleep(0.05)
+        raise RuntimeError('gunicorn no quedó listo a tiempo')
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        if self.log is not subprocess.DEVNULL:
+            self.log.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+class MemorySampler(threading.Thread):
+    """Muestrea RSS/PSS del master y los workers durante la corrida"""
+
+    def __init__(self, master_pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.max_rss_kb = {}
+        self.max_total_pss_kb = 0
+
+    def reset(self):
+        with self.lock:
+            self.max_rss_kb = {}
+            self.max_total_pss_kb = 0
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            pids = child_pids(self.master_pid)
+            memory = {pid: memory_kb(pid) for pid in pids}
+            total_pss = memory_kb(self.master_pid)['pss_kb'] + sum(m['pss_kb'] for m in memory.values())
+            with self.lock:
+                for pid, m in memory.items():
+                    self.max_rss_kb[pid] = max(self.max_rss_kb.get(pid, 0), m['rss_kb'])
+                self.max_total_pss_kb = max(self.max_total_pss_kb, total_pss)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'workers_seen': len(self.max_rss_kb),
+                'workers_max_rss_mb': sorted(round(kb / 1024, 1) for kb in self.max_rss_kb.values()),
+                'max_total_pss_mb': round(self.max_total_pss_kb / 1024, 1),
+            }
+
+def mutate_catalog(records, fraction, rng):
+    """Copia del catálogo con el stock de una fracción de variantes cambiado"""
+    records = [dict(record) for record in records]
+    for record in rng.sample(records, max(1, int(len(records) * fraction))):
+        stock = 0 if rng.random() < 0.5 else rng.randint(1, 200)
+        record['stock'] = stock
+        record['available'] = stock > 0
+    return records
+
+def reload_all_workers(server, records, fraction, rng, timeout=300):
+    """Escribe un catálogo modificado y recarga cada worker hasta que todos tengan la nueva generación"""
+    data = json.dumps(mutate_catalog(records, fraction, rng), ensure_ascii=False).encode('utf-8')
+    generation = hashlib.sha256(data).hexdigest()[:16]
+    tmp_path = server.catalog_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, server.catalog_path)
+
+    started = time.monotonic()
+    reloaded = {}
+    headers = {'X-Reload-Token': server.token}
+    # Peticiones en paralelo: mientras un worker recarga, las siguientes caen en otro
+    with ThreadPoolExecutor(max_workers=server.workers) as pool:
+        while time.monotonic() - started < timeout:
+            responses = pool.map(lambda _: send(server.base_url, '/api/reload', {}, headers, timeout),
+                                 range(server.workers))
+            for status, body in responses:
+                if status != 200:
+                    continue
+                result = json.loads(body)
+                if result['catalog_generation'] == generation:
+                    reloaded.setdefault(result['worker_pid'], result['load_seconds'])
+            if set(child_pids(server.pid)) <= set(reloaded):
+                break
+    finished = time.monotonic()
+    return {
+        'generation': generation,
+        'started': started,
+        'finished': finished,
+        'seconds': round(finished - started, 3),
+        'worker_load_seconds': sorted(reloaded.values()),
+        'complete': set(child_pids(server.pid)) <= set(reloaded),
+    }
+
+def percentiles(values):
+    if not values:
+        return {'p50_ms': None, 'p90_ms': None, 'p99_ms': None, 'max_ms': None}
+    values = sorted(values)
+    pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1)
+    return {'p50_ms': pick(0.5), 'p90_ms': pick(0.9), 'p99_ms': pick(0.99), 'max_ms': round(values[-1] * 1000, 1)}
+
+def run_rate(base_url, rate, duration, profile, rng, health_ratio, concurrency, timeout, on_tick=None):
+    """Envía peticiones a tasa fija durante duration segundos (lazo abierto)"""
+    results = []
+    lock = threading.Lock()
+
+    def fire(scheduled, path, answer):
+        sent = time.monotonic()
+        status, body = send(base_url, path, answer, timeout=timeout)
+        done = time.monotonic()
+        with lock:
+            results.append({
+                'path': path,
+                'scheduled': scheduled,
+                'sent': sent,
+                'done': done,
+                'latency': done - scheduled,
+                'status': status,
+                'key': answer_key(answer) if answer else None,
+                'body_hash': hashlib.sha256(body).hexdigest() if answer and status == 200 else None,
+            })
+
+    start = time.monotonic()
+    total = int(rate * duration)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(total):
+            scheduled = start + i / rate
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if on_tick:
+                on_tick(scheduled - start)
+            if rng.random() < health_ratio:
+                pool.submit(fire, scheduled, '/health', None)
+            else:
+                pool.submit(fire, scheduled, RECOMMEND_PATH, quiz_answer(profile, rng))
+    return results, start, time.monotonic()
+
+def consistency(results, reloads, start, end):
+    """Respuestas del quiz con más de un resultado distinto entre recargas consecutivas"""
+    boundaries = [start] + [t for r in reloads for t in (r['started'], r['finished'])] + [end]
+    segments = list(zip(boundaries[::2], boundaries[1::2]))
+    inconsistent = 0
+    checked = 0
+    for seg_start, seg_end in segments:
+        hashes = {}
+        for r in results:
+            if r['body_hash'] and r['sent'] >= seg_start and r['done'] <= seg_end:
+                hashes.setdefault(r['key'], set()).add(r['body_hash'])
+        checked += len(hashes)
+        inconsistent += sum(1 for h in hashes.values() if len(h) > 1)
+    return {'answers_checked': checked, 'inconsistent_answers': inconsistent}
+
+def summarize(rate, results, start, end, reloads, memory):
+    elapsed = end - start
+    recommend = [r for r in results if r['path'] == RECOMMEND_PATH]
+    health = [r for r in results if r['path'] == '/health']
+    errors = {}
+    for r in results:
+        if r['status'] != 200:
+            label = str(r['status']) if r['status'] else 'sin respuesta'
+            errors[label] = errors.get(label, 0) + 1
+
+    summary = {
+        'rate': rate,
+        'requests': len(results),
+        'throughput_rps': round(len(results) / elapsed, 1) if elapsed > 0 else 0,
+        'error_rate': round(sum(errors.values()) / len(results), 4) if results else 0,
+        'errors': errors,
+        'distinct_answers': len({r['key'] for r in recommend}),
+        'recomendar': percentiles([r['latency'] for r in recommend]),
+        'health': percentiles([r['latency'] for r in health]),
+        'memory': memory,
+    }
+    if reloads:
+        during = [r['latency'] for r in recommend
+                  if any(x['started'] <= r['scheduled'] <= x['finished'] for x in reloads)]
+        summary['reloads'] = [{key: r[key] for key in ('generation', 'seconds', 'worker_load_seconds', 'complete')}
+                              for r in reloads]
+        summary['recomendar_during_reload'] = percentiles(during)
+        summary.update(consistency(results, reloads, start, end))
+    return summary
+
+def print_report(summaries):
+    print(f"\n{'tasa':>6} {'peticiones':>10} {'req/s':>7} {'errores':>8} "
+          f"{'p50(ms)':>8} {'p90(ms)':>8} {'p99(ms)':>8} {'max(ms)':>8} {'health p99':>10} {'RSS máx workers(MB)':>22}")
+    for s in summaries:
+        r = s['recomendar']
+        print(f"{s['rate']:>6} {s['requests']:>10} {s['throughput_rps']:>7} {s['error_rate']:>8.2%} "
+              f"{str(r['p50_ms']):>8} {str(r['p90_ms']):>8} {str(r['p99_ms']):>8} {str(r['max_ms']):>8} "
+              f"{str(s['health']['p99_ms']):>10} {str(s['memory'].get('workers_max_rss_mb', '-')):>22}")
+    for s in summaries:
+        if s['errors']:
+            print(f"⚠️ Errores a {s['rate']} req/s: {s['errors']}")
+        for reload in s.get('reloads', []):
+            estado = '✅' if reload['complete'] else '❌ incompleta'
+            print(f"🔁 Recarga a {s['rate']} req/s: {reload['seconds']}s para todos los workers "
+                  f"(carga por worker {reload['worker_load_seconds']}) {estado}")
+        if 'reloads' in s:
+            d = s['recomendar_during_reload']
+            print(f"   latencia durante la recarga: p50 {d['p50_ms']}ms, p99 {d['p99_ms']}ms; "
+                  f"respuestas incoherentes: {s['inconsistent_answers']} de {s['answers_checked']}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de los endpoints del recomendador')
+    parser.add_argument('--app-dir', default=ROOT, help='Directorio con app.py (por defecto este repo)')
+    parser.add_argument('--catalog', default=os.path.join(ROOT, 'shopify_products.json'),
+                        help='Catálogo a servir (se copia; el original no se modifica)')
+    parser.add_argument('--url', help='Usar un servidor ya levantado (sin RSS ni recargas)')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--no-preload', action='store_true', help='Cada worker carga su propio catálogo')
+    parser.add_argument('--cache', default='disk', help='CACHE_BACKEND del servidor (disk, redis o none)')
+    parser.add_argument('--rates', default='5,20,50', help='Tasas en peticiones por segundo, separadas por coma')
+    parser.add_argument('--duration', type=float, default=20, help='Segundos por tasa')
+    parser.add_argument('--warmup', type=float, default=2, help='Segundos a la primera tasa sin medir')
+    parser.add_argument('--health-ratio', type=float, default=0.1, help='Fracción de peticiones a /health')
+    parser.add_argument('--concurrency', type=int, default=64, help='Peticiones simultáneas máximas del cliente')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--profile', help='JSON con la distribución de respuestas del quiz')
+    parser.add_argument('--reload-at', type=float, help='Segundo de cada tasa en que se recarga el catálogo')
+    parser.add_argument('--reload-fraction', type=float, default=0.05, help='Fracción de variantes con stock cambiado')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--server-log', help='Guardar la salida de gunicorn en este archivo')
+    parser.add_argument('--json', help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    profile = load_profile(args.profile)
+    rng = random.Random(args.seed)
+    reload_rng = random.Random(args.seed + 1)
+    rates = [float(rate) for rate in args.rates.split(',')]
+
+    server = None
+    sampler = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+        if args.reload_at is not None:
+            parser.error('--reload-at requiere el servidor local (sin --url)')
+    else:
+        print(f"🚀 gunicorn con {args.workers} workers sobre {args.catalog}...")
+        server = Server(args.app_dir, args.catalog, args.workers, not args.no_preload, args.cache, args.server_log)
+        base_url = server.base_url
+
+    summaries = []
+    try:
+        if server:
+            server.wait_ready()
+            sampler = MemorySampler(server.pid)
+            sampler.start()
+        records = None
+        if args.reload_at is not None:
+            with open(server.catalog_path, encoding='utf-8') as f:
+                records = json.load(f)
+
+        if args.warmup > 0:
+            print(f"🔥 Calentando {args.warmup}s a {rates[0]} req/s...")
+            run_rate(base_url, rates[0], args.warmup, profile, rng, args.health_ratio, args.concurrency, args.timeout)
+
+        for rate in rates:
+            print(f"📈 {rate} req/s durante {args.duration}s...")
+            if sampler:
+                sampler.reset()
+            reloads = []
+            reload_threads = []
+
+            def on_tick(elapsed):
+                if args.reload_at is None or reload_threads or elapsed < args.reload_at:
+                    return
+                thread = threading.Thread(
+                    target=lambda: reloads.append(
+                        reload_all_workers(server, records, args.reload_fraction, reload_rng)
+                    ),
+                    daemon=True
+                )
+                reload_threads.append(thread)
+                thread.start()
+
+            results, start, end = run_rate(base_url, rate, args.duration, profile, rng, args.health_ratio,
+                                           args.concurrency, args.timeout, on_tick)
+            for thread in reload_threads:
+                thread.join()
+            memory = sampler.snapshot() if sampler else {}
+            summaries.append(summarize(rate, results, start, end, reloads, memory))
+    finally:
+        if sampler:
+            sampler.stopped.set()
+        if server:
+            server.stop()
+
+    print_report(summaries)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'profile': profile, 'workers': args.workers, 'rates': summaries}, f,
+                      ensure_ascii=False, indent=2)
+        print(f"💾 Resultados guardados en {args.json}")
+
+if __name__ == '__main__':
+    main()
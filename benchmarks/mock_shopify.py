@@ -0,0 +1,384 @@
+"""Servidor local que imita la Admin REST API de Shopify para pruebas y benchmarks.
+
+Expone products, custom_collections, smart_collections, collections/<id>/products
+y orders con paginación por cursor (header Link con page_info), header
+X-Shopify-Shop-Api-Call-Limit, respuestas 429 con un leaky bucket como el de
+Shopify, el parámetro fields y compresión gzip. El catálogo y las órdenes se generan de forma determinista a partir de
+una semilla, sin guardar las órdenes en memoria.
+
+Uso:
+    python -m benchmarks.mock_shopify --products 1000 --orders 5000 --port 8081
+"""
+import argparse
+import base64
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+API_VERSION = '2024-01'
+API_PATH = re.compile(r'^/admin/api/[0-9]{4}-[0-9]{2}/(.+)\.json$')
+MAX_PAGE_SIZE = 250
+
+PRODUCT_TYPES = [
+    ('Tintas Labiales', 22), ('Hidratante', 7), ('Serum', 7), ('Glitter de Ojos', 5),
+    ('Paleta de Sombras', 5), ('Tónico', 5), ('Limpiador Oleoso', 4), ('Mascarilla', 4),
+    ('Protector Solar', 4), ('Limpiador en Espuma', 4), ('Esencia', 2), ('Contorno de Ojos', 2),
+    ('Cushion', 3), ('Balsamo Labial', 3), ('', 3)
+]
+VENDORS = [
+    'Peripera', 'Rom&nd', 'Lily by Red', 'Black Rouge', 'Skin1004', 'CosRX', 'Banila Co',
+    'Holika Holika', 'Mixsoon', 'Beauty of Joseon', 'Anua', 'Isntree', 'Round Lab', 'Tocobo'
+]
+TAGS = [
+    'Sensible', 'Grasa', 'Vegano', 'Seca', 'Arrugas / Antiedad', 'Mixta', 'Manchas / Pigmentación',
+    'Poros Dilatados', 'Rojeces', 'Acné / Granos', 'Sebo', 'Hidratación', 'Protección UV', 'Oferta'
+]
+SKIN_COLLECTIONS = {
+    'Grasa': 'piel-grasa', 'Seca': 'piel-seca', 'Mixta': 'piel-mixta', 'Sensible': 'piel-sensible'
+}
+FINANCIAL_STATUSES = ['paid'] * 8 + ['partially_paid', 'pending', 'refunded']
+
+def _slug(text):
+    return ''.join(c if c.isalnum() else '-' for c in text.lower()).strip('-') or 'otros'
+
+def _encode_cursor(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+
+def _decode_cursor(value):
+    return json.loads(base64.urlsafe_b64decode(value.encode('ascii')))
+
+class MockShopifyStore:
+    """Catálogo sintético: productos con variantes, colecciones y órdenes"""
+
+    def __init__(self, num_products=500, num_orders=2000, seed=42, days=90):
+        self.num_orders = num_orders
+        self.seed = seed
+        self.days = days
+        self.now = datetime.now(timezone.utc)
+        rng = random.Random(seed)
+
+        self.collections = []
+        collection_ids = {}
+
+        def add_collection(handle, title, kind):
+            if handle in collection_ids:
+                return collection_ids[handle]
+            collection_id = 400000000000 + len(self.collections)
+            self.collections.append({'id': collection_id, 'handle': handle, 'title': title, 'type': kind})
+            collection_ids[handle] = collection_id
+            return collection_id
+
+        for tag, handle in SKIN_COLLECTIONS.items():
+            add_collection(handle, f"Piel {tag}", 'smart')
+        add_collection('skincare', 'Skincare', 'custom')
+
+        self.products = []
+        self.members = {}
+        self.variants = []
+        types, weights = zip(*PRODUCT_TYPES)
+
+        for i in range(num_products):
+            product_id = 8000000000000 + i
+            product_type = rng.choices(types, weights)[0]
+            vendor = rng.choice(VENDORS)
+            tags = sorted(rng.sample(TAGS, rng.randint(0, 5)))
+            title = f"{vendor} - {product_type or 'Producto'} {i}"
+            handle = f"{_slug(title)}-{i}"
+
+            variants = []
+            for v in range(rng.choice([1, 1, 1, 1, 2, 3, 6])):
+                variant_id = 40000000000000 + i * 10 + v
+                variants.append({
+                    'id': variant_id,
+                    'product_id': product_id,
+                    'title': f"Variante {v + 1}",
+                    'price': f"{rng.randrange(4990, 65000, 1000):.2f}",
+                    'sku': f"SKU-{i}-{v}",
+                    'inventory_quantity': rng.choice([0, 0, 1, 2, 3, 5, 8, 12, 25, 60, 120])
+                })
+                self.variants.append((product_id, variant_id, title))
+
+            images = [{'src': f"https://cdn.shopify.com/s/files/1/0000/0000/files/{handle}.jpg?v=1"}] if rng.random() > 0.1 else []
+            self.products.append({
+                'id': product_id,
+                'title': title,
+                'handle': handle,
+                'product_type': product_type,
+                'vendor': vendor,
+                'tags': ', '.join(tags),
+                'variants': variants,
+                'images': images,
+                'image': images[0] if images else None
+            })
+
+            memberships = [add_collection(_slug(vendor), vendor, 'custom'),
+                           add_collection(_slug(product_type or 'otros'), product_type or 'Otros', 'custom')]
+            if product_type not in ('Tintas Labiales', 'Glitter de Ojos', 'Paleta de Sombras', 'Cushion'):
+                memberships.append(collection_ids['skincare'])
+            memberships += [collection_ids[handle] for tag, handle in SKIN_COLLECTIONS.items() if tag in tags]
+            memberships += [add_collection(_slug(tag), tag, 'smart') for tag in tags if tag not in SKIN_COLLECTIONS]
+            for collection_id in memberships:
+                self.members.setdefault(collection_id, []).append(i)
+
+        # Popularidad sesgada: pocas variantes concentran la mayoría de las ventas
+        self.variant_weights = [1.0 / (rank + 1) ** 0.8 for rank in range(len(self.variants))]
+        rng.shuffle(self.variant_weights)
+        self._cumulative_weights = []
+        total = 0.0
+        for weight in self.variant_weights:
+            total += weight
+            self._cumulative_weights.append(total)
+
+    def order(self, index):
+        """Genera la orden index de forma determinista (más reciente primero)"""
+        rng = random.Random(self.seed * 1000003 + index)
+        age = self.days * index / max(self.num_orders, 1)
+        created_at = self.now - timedelta(days=age, minutes=rng.randint(0, 600))
+        line_items = []
+        picks = rng.choices(range(len(self.variants)), cum_weights=self._cumulative_weights, k=rng.randint(1, 3))
+        for pick in picks:
+            product_id, variant_id, title = self.variants[pick]
+            line_items.append({
+                'id': index * 10 + len(line_items),
+                'product_id': product_id,
+                'variant_id': variant_id,
+                'title': title,
+                'quantity': rng.randint(1, 3)
+            })
+        return {
+            'id': 5000000000000 + index,
+            'created_at': created_at.isoformat(timespec='seconds'),
+            'financial_status': rng.choice(FINANCIAL_STATUSES),
+            'line_items': line_items
+        }
+
+class LeakyBucket:
+    """Límite de llamadas estilo Shopify: capacidad fija que se vacía a ritmo constante"""
+
+    def __init__(self, capacity=40, leak_rate=2.0):
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.level = 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Devuelve (permitido, nivel_actual)"""
+        with self.lock:
+            now = time.monotonic()
+            self.level = max(0.0, self.level - (now - self.updated) * self.leak_rate)
+            self.updated = now
+            if self.level + 1 > self.capacity:
+                return False, int(self.level)
+            self.level += 1
+            return True, int(self.level)
+
+class MockShopifyServer:
+    """Servidor HTTP en un hilo; usar como context manager o con start()/stop()"""
+
+    def __init__(self, store, host='127.0.0.1', port=0, latency=0.0,
+                 rate_limit=False, bucket_size=40, leak_rate=2.0, fail_requests=None, fail_retries=0):
+        self.store = store
+        self.latency = latency
+        self.bucket = LeakyBucket(bucket_size, leak_rate) if rate_limit else None
+        # Números de petición (1-based) que responden 500, para simular caídas; los
+        # siguientes fail_retries pedidos a la misma URL también fallan (con
+        # fail_retries=config.MAX_RETRIES el cliente agota sus reintentos)
+        self.fail_requests = set(fail_requests or [])
+        self.fail_retries = fail_retries
+        self.failing_urls = {}
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/admin/api/{API_VERSION}/"
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {'requests': 0, 'throttled': 0, 'failed': 0, 'bytes': 0, 'by_endpoint': {}}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _should_fail(self, number, url):
+        with self.stats_lock:
+            if number in self.fail_requests:
+                self.failing_urls[url] = self.fail_retries
+            elif self.failing_urls.get(url, 0) > 0:
+                self.failing_urls[url] -= 1
+            else:
+                return False
+            self.stats['failed'] += 1
+            return True
+
+    def _record(self, endpoint):
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['by_endpoint'][endpoint] = self.stats['by_endpoint'].get(endpoint, 0) + 1
+            return self.stats['requests']
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                # Shopify tolera barras duplicadas (site con "/" final + "/orders.json")
+                parsed = parsed._replace(path=re.sub('/+', '/', parsed.path))
+                match = API_PATH.match(parsed.path)
+                if not match:
+                    return self._send(404, {'errors': 'Not Found'})
+                endpoint = match.group(1)
+                params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                number = server._record(endpoint.split('/')[0])
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                call_limit = None
+                if server.bucket:
+                    allowed, level = server.bucket.take()
+                    call_limit = f"{level}/{server.bucket.capacity}"
+                    if not allowed:
+                        with server.stats_lock:
+                            server.stats['throttled'] += 1
+                        return self._send(429, {'errors': 'Exceeded 2 calls per second for api client. Reduce request rates to resume uninterrupted service.'},
+                                          {'Retry-After': '1.0', 'X-Shopify-Shop-Api-Call-Limit': call_limit})
+
+                if server._should_fail(number, self.path):
+                    return self._send(500, {'errors': 'Internal Server Error'})
+
+                try:
+                    body, next_cursor = self._route(endpoint, params)
+                except KeyError:
+                    return self._send(404, {'errors': 'Not Found'})
+                except ValueError as e:
+                    return self._send(400, {'errors': str(e)})
+
+                headers = {}
+                if call_limit:
+                    headers['X-Shopify-Shop-Api-Call-Limit'] = call_limit
+                if next_cursor:
+                    link_params = {'limit': params.get('limit', 50), 'page_info': next_cursor}
+                    if 'fields' in params:
+                        link_params['fields'] = params['fields']
+                    query = urlencode(link_params)
+                    host = self.headers.get('Host', '%s:%s' % self.server.server_address[:2])
+                    headers['Link'] = f'<http://{host}{parsed.path}?{query}>; rel="next"'
+                return self._send(200, body, headers)
+
+            def _route(self, endpoint, params):
+                limit = min(int(params.get('limit', 50)), MAX_PAGE_SIZE)
+                if 'page_info' in params:
+                    cursor = _decode_cursor(params['page_info'])
+                else:
+                    cursor = {'offset': 0, 'filters': {k: v for k, v in params.items() if k not in ('limit', 'fields')}}
+                offset, filters = cursor['offset'], cursor['filters']
+
+                store = server.store
+                parts = endpoint.split('/')
+                if endpoint in ('custom_collections', 'smart_collections'):
+                    kind = endpoint.split('_')[0]
+                    items = [{k: c[k] for k in ('id', 'handle', 'title')} for c in store.collections if c['type'] == kind]
+                    total, page = len(items), items[offset:offset + limit]
+                    key = endpoint
+                elif endpoint == 'products' or (len(parts) == 3 and parts[0] == 'collections' and parts[2] == 'products'):
+                    collection_id = filters.get('collection_id') or (parts[1] if len(parts) == 3 else None)
+                    if collection_id is not None:
+                        indexes = store.members.get(int(collection_id), [])
+                    else:
+                        indexes = range(len(store.products))
+                    total = len(indexes)
+                    page = [store.products[i] for i in indexes[offset:offset + limit]]
+                    key = 'products'
+                elif endpoint == 'orders':
+                    created_at_min = filters.get('created_at_min')
+                    total = store.num_orders
+                    page = [store.order(i) for i in range(offset, min(offset + limit, total))]
+                    if created_at_min:
+                        since = datetime.fromisoformat(created_at_min.replace('Z', '+00:00'))
+                        if since.tzinfo is None:
+                            since = since.replace(tzinfo=timezone.utc)
+                        page = [o for o in page if datetime.fromisoformat(o['created_at']) >= since]
+                    key = 'orders'
+                else:
+                    raise KeyError(endpoint)
+
+                next_cursor = None
+                if offset + limit < total:
+                    next_cursor = _encode_cursor({'offset': offset + limit, 'filters': filters})
+                # Como en Shopify, fields limita los atributos devueltos
+                if 'fields' in params:
+                    fields = set(params['fields'].split(','))
+                    page = [{k: v for k, v in item.items() if k in fields} for item in page]
+                return {key: page}, next_cursor
+
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body).encode('utf-8')
+                gzipped = 'gzip' in self.headers.get('Accept-Encoding', '') and len(payload) > 1024
+                if gzipped:
+                    payload = gzip.compress(payload, compresslevel=5)
+                with server.stats_lock:
+                    server.stats['bytes'] += len(payload)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                if gzipped:
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor Shopify simulado')
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--rate-limit', action='store_true', help='Activa el leaky bucket (40 llamadas, 2/s)')
+    args = parser.parse_args()
+
+    store = MockShopifyStore(args.products, args.orders, seed=args.seed)
+    server = MockShopifyServer(store, port=args.port, latency=args.latency_ms / 1000, rate_limit=args.rate_limit)
+    print(f"🛍️ Shopify simulado en {server.url} ({args.products} productos, {args.orders} órdenes)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+"""Sincronización del catálogo de Shopify hacia shopify_products.json.
+
+Subcomandos (python -m catalog_sync <comando>):
+    full       colecciones, productos, ventas y membresías (archivo completo)
+    inventory  solo stock/disponibilidad de las variantes existentes
+    sales      solo métricas de ventas de las variantes existentes
+"""
+from catalog_sync.client import ShopifyClient
+from catalog_sync.sync import sync_full, sync_inventory, sync_sales
+
+__all__ = ['ShopifyClient', 'sync_full', 'sync_inventory', 'sync_sales']
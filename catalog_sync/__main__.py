@@ -0,0 +1,35 @@
+"""CLI: python -m catalog_sync {full,inventory,sales} [--concurrency N] [--fresh] [--output ARCHIVO]"""
+import argparse
+import sys
+
+from catalog_sync import config
+from catalog_sync.sync import sync_full, sync_inventory, sync_sales
+
+COMMANDS = {
+    'full': sync_full,
+    'inventory': sync_inventory,
+    'sales': sync_sales,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='catalog_sync', description='Sincronización del catálogo de Shopify')
+    parser.add_argument('command', choices=list(COMMANDS), help='Qué sincronizar')
+    parser.add_argument('--concurrency', type=int, default=config.SYNC_CONCURRENCY,
+                        help='Conexiones HTTP simultáneas (SYNC_CONCURRENCY)')
+    parser.add_argument('--fresh', action='store_true', help='Descartar el checkpoint y empezar de cero')
+    parser.add_argument('--output', default=config.OUTPUT_FILE, help='Archivo de productos a escribir')
+    args = parser.parse_args(argv)
+
+    print(f"=== SHOPIFY SYNC: {args.command.upper()} ===")
+    result = COMMANDS[args.command](resume=not args.fresh, concurrency=args.concurrency, output=args.output)
+
+    if result is None:
+        print(f"\n❌ SINCRONIZACIÓN FALLÓ")
+        print(f"Revisa los errores arriba y verifica tu configuración")
+        return 1
+
+    print(f"\n🎉 SINCRONIZACIÓN EXITOSA")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Checkpoints de la sincronización con Shopify para poder reanudarla.
+
+Cada fase (colecciones, páginas de productos, páginas de órdenes, membresías de
+colecciones) agrega un registro por página a su propio archivo JSONL, y
+state.json guarda qué fases terminaron. Si la sincronización falla, la
+siguiente ejecución relee los registros y continúa desde el último cursor
+guardado en vez de empezar de cero.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+SYNC_STATE_DIR = os.getenv('SYNC_STATE_DIR', '.sync_state')
+SYNC_CHECKPOINT_MAX_AGE_HOURS = 12
+
+class SyncCheckpoint:
+    """Estado persistente de una sincronización en curso"""
+
+    def __init__(self, directory=SYNC_STATE_DIR, scope=None, max_age_hours=SYNC_CHECKPOINT_MAX_AGE_HOURS):
+        self.directory = directory
+        # Las fases pueden correr en paralelo: las escrituras se serializan
+        self.lock = threading.Lock()
+        self.state_path = os.path.join(directory, 'state.json')
+        self.state = self._load_state()
+
+        # Un checkpoint viejo o de otra tienda/endpoint no se reutiliza
+        age_hours = (time.time() - self.state.get('started_at', 0)) / 3600
+        if self.state and (self.state.get('scope') != scope or age_hours > max_age_hours):
+            print("🧹 Checkpoint anterior descartado (vencido o de otro origen)")
+            self.clear()
+            self.state = {}
+
+        self.resumed = bool(self.state)
+        if self.resumed:
+            self._repair()
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self.state = {'scope': scope, 'started_at': time.time(), 'done': []}
+            self._save_state()
+
+    def _repair(self):
+        """Recorta líneas incompletas que dejó una escritura interrumpida"""
+        for name in os.listdir(self.directory):
+            if not name.endswith('.jsonl'):
+                continue
+            path = os.path.join(self.directory, name)
+            with open(path, 'rb+') as f:
+                data = f.read()
+                if data and not data.endswith(b'\n'):
+                    f.truncate(data.rfind(b'\n') + 1)
+
+    @property
+    def started_at(self):
+        return self.state['started_at']
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _phase_path(self, phase):
+        return os.path.join(self.directory, f"{phase}.jsonl")
+
+    def is_done(self, phase):
+        return phase in self.state['done']
+
+    def mark_done(self, phase):
+        with self.lock:
+            if phase not in self.state['done']:
+                self.state['done'].append(phase)
+                self._save_state()
+
+    def append(self, phase, record):
+        """Guarda un registro (una página ya procesada) de la fase"""
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self.lock:
+            with open(self._phase_path(phase), 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def records(self, phase):
+        """Registros guardados de la fase; ignora una última línea incompleta"""
+        records = []
+        try:
+            with open(self._phase_path(phase), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+        except OSError:
+            pass
+        return records
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,111 @@
+"""Cliente HTTP de la Admin REST API de Shopify sobre una sesión con pool de conexiones"""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from catalog_sync import config
+
+class ShopifyClient:
+    """Sesión requests reutilizable: keep-alive, gzip, paginación por header Link y reintentos.
+
+    Todas las llamadas (también desde varios hilos) comparten hasta
+    `concurrency` conexiones abiertas con la tienda.
+    """
+
+    def __init__(self, api_url=None, access_token=None, concurrency=None, timeout=config.REQUEST_TIMEOUT):
+        self.api_url = (api_url or config.API_URL).rstrip('/') + '/'
+        self.concurrency = max(int(concurrency or config.SYNC_CONCURRENCY), 1)
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'X-Shopify-Access-Token': access_token or config.ACCESS_TOKEN or '',
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+        })
+
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, path_or_url, params=None):
+        """GET con reintentos para 429, 5xx y errores de red (backoff exponencial con jitter)"""
+        url = path_or_url if path_or_url.startswith('http') else self.api_url + path_or_url
+
+        for attempt in range(config.MAX_RETRIES + 1):
+            with self.lock:
+                self.calls += 1
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == config.MAX_RETRIES:
+                    raise
+                self._backoff(attempt, f"de red ({e})")
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt == config.MAX_RETRIES:
+                    response.raise_for_status()
+                self._backoff(attempt, response.status_code, response.headers.get('Retry-After'))
+                continue
+
+            response.raise_for_status()
+            self._respect_call_limit(response)
+            return response
+
+    def _backoff(self, attempt, reason, retry_after=None):
+        delay = min(config.RETRY_BASE_SECONDS * 2 ** attempt, config.RETRY_MAX_SECONDS)
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        delay += random.uniform(0, delay * 0.1)
+        with self.lock:
+            self.retries += 1
+        print(f"   ⏳ Error {reason}, reintento {attempt + 1}/{config.MAX_RETRIES} en {delay:.1f}s")
+        time.sleep(delay)
+
+    def _respect_call_limit(self, response):
+        """Frena antes de llegar al 429 cuando el bucket de Shopify está casi lleno"""
+        call_limit = response.headers.get('X-Shopify-Shop-Api-Call-Limit')
+        if not call_limit:
+            return
+        try:
+            used, capacity = (int(x) for x in call_limit.split('/'))
+        except ValueError:
+            return
+        if used >= capacity * 0.8:
+            time.sleep(0.5)
+
+    def paginate(self, path, key, params=None, next_url=None):
+        """Recorre una consulta paginada devolviendo (items, url de la página siguiente).
+
+        Si se pasa next_url la consulta continúa desde ese cursor.
+        """
+        if next_url:
+            response = self.get(next_url)
+        else:
+            response = self.get(path, params=params)
+
+        while True:
+            next_url = response.links.get('next', {}).get('url')
+            yield response.json().get(key, []), next_url
+            if not next_url:
+                break
+            response = self.get(next_url)
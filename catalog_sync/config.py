@@ -0,0 +1,32 @@
+"""Configuración de la sincronización (variables de entorno / .env)"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# SHOPIFY_SHOP_DOMAIN (tu-tienda.myshopify.com) o, por compatibilidad, SHOPIFY_SHOP_NAME (tu-tienda)
+SHOP_DOMAIN = os.getenv('SHOPIFY_SHOP_DOMAIN') or (
+    f"{os.getenv('SHOPIFY_SHOP_NAME')}.myshopify.com" if os.getenv('SHOPIFY_SHOP_NAME') else None
+)
+ACCESS_TOKEN = os.getenv('SHOPIFY_ACCESS_TOKEN')
+API_VERSION = os.getenv('SHOPIFY_API_VERSION', '2024-01')
+# Permite apuntar a otro endpoint (p.ej. benchmarks/mock_shopify.py)
+API_URL = os.getenv('SHOPIFY_API_URL') or f"https://{SHOP_DOMAIN}/admin/api/{API_VERSION}/"
+
+OUTPUT_FILE = os.getenv('PRODUCTS_FILE', 'shopify_products.json')
+
+# Conexiones HTTP simultáneas (y tamaño del pool de keep-alive)
+SYNC_CONCURRENCY = int(os.getenv('SYNC_CONCURRENCY', 4))
+PAGE_SIZE = 250
+
+# Reintentos por llamada a la API
+MAX_RETRIES = 5
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 60.0
+REQUEST_TIMEOUT = 30
+
+# Ventana y decaimiento para la velocidad de ventas
+SALES_WINDOW_DAYS = 90
+SALES_HALF_LIFE_DAYS = 30
+MAX_DAYS_OF_COVER = 365
@@ -0,0 +1,163 @@
+"""Esquema único de registros de shopify_products.json (un registro por variante)"""
+import math
+from datetime import datetime, timezone
+
+from catalog_sync import config
+
+def order_decay_weight(created_at, now):
+    """Peso exponencial de una orden según su antigüedad (vida media SALES_HALF_LIFE_DAYS)"""
+    try:
+        created = datetime.fromisoformat(str(created_at).replace('Z', '+00:00'))
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=timezone.utc)
+        age_days = max((now - created).total_seconds() / 86400, 0)
+    except (TypeError, ValueError):
+        age_days = config.SALES_WINDOW_DAYS
+    return 0.5 ** (age_days / config.SALES_HALF_LIFE_DAYS)
+
+def decay_window_days():
+    """Días efectivos de la ventana con decaimiento (integral del peso en la ventana)"""
+    decay_rate = math.log(2) / config.SALES_HALF_LIFE_DAYS
+    return (1 - math.exp(-decay_rate * config.SALES_WINDOW_DAYS)) / decay_rate
+
+def accumulate_order_sales(order, sales_by_product, now):
+    """Suma las líneas de una orden pagada a las ventas por variante"""
+    weight = order_decay_weight(order.get('created_at'), now)
+
+    for line_item in order.get('line_items') or []:
+        product_id = str(line_item['product_id']) if line_item.get('product_id') else 'unknown'
+        variant_id = str(line_item['variant_id']) if line_item.get('variant_id') else 'unknown'
+        quantity = line_item.get('quantity') or 0
+
+        # Crear clave única para producto-variante
+        key = f"{product_id}-{variant_id}"
+
+        if key not in sales_by_product:
+            sales_by_product[key] = {
+                'product_id': product_id,
+                'variant_id': variant_id,
+                'total_sold': 0,
+                'order_count': 0,
+                'weighted_sold': 0.0,
+                'product_title': line_item.get('title') or 'Unknown'
+            }
+
+        sales_by_product[key]['total_sold'] += quantity
+        sales_by_product[key]['order_count'] += 1
+        sales_by_product[key]['weighted_sold'] += quantity * weight
+
+def merge_sales(sales_by_product, page_sales):
+    """Suma las ventas de una página (p.ej. recuperada del checkpoint) al total"""
+    for key, data in page_sales.items():
+        if key not in sales_by_product:
+            sales_by_product[key] = dict(data)
+            continue
+        total = sales_by_product[key]
+        total['total_sold'] += data['total_sold']
+        total['order_count'] += data['order_count']
+        total['weighted_sold'] += data['weighted_sold']
+
+def sales_score_for(total_sold):
+    """Score basado ÚNICAMENTE en cantidad vendida"""
+    if total_sold > 100:
+        return 1.0
+    if total_sold > 50:
+        return 0.9
+    if total_sold > 20:
+        return 0.7
+    if total_sold > 10:
+        return 0.5
+    if total_sold > 5:
+        return 0.3
+    if total_sold > 0:
+        return 0.1
+    return 0.0
+
+def calculate_popularity_metrics(stock, variant_sales):
+    """Calcula métricas basadas en ventas históricas REALES para una variante"""
+    total_sold = variant_sales.get('total_sold', 0)
+    order_count = variant_sales.get('order_count', 0)
+
+    # Velocidad de ventas con decaimiento (unidades/día) y días de cobertura del stock
+    sales_velocity = variant_sales.get('weighted_sold', 0.0) / decay_window_days()
+    if stock <= 0:
+        days_of_cover = 0.0
+    elif sales_velocity > 0:
+        days_of_cover = min(stock / sales_velocity, config.MAX_DAYS_OF_COVER)
+    else:
+        days_of_cover = float(config.MAX_DAYS_OF_COVER)
+
+    # Score final: score de ventas si está disponible, 0 si no hay stock
+    sales_score = sales_score_for(total_sold)
+    final_ranking_score = sales_score if stock > 0 else 0.0
+
+    return {
+        'popularity_score': round(sales_score, 3),
+        'sales_score': round(sales_score, 3),
+        'total_sold': total_sold,
+        'order_count': order_count,
+        'sales_velocity': round(sales_velocity, 4),
+        'days_of_cover': round(days_of_cover, 1),
+        'final_ranking_score': round(final_ranking_score, 3)
+    }
+
+def refresh_record_metrics(record, stock=None, sales_data=None):
+    """Actualiza stock y/o ventas de un registro existente recalculando las métricas derivadas"""
+    if stock is not None:
+        record['stock'] = stock
+        record['available'] = stock > 0
+
+    if sales_data is not None:
+        variant_sales = sales_data.get(f"{record['product_id']}-{record['variant_id']}", {})
+    else:
+        # Solo cambió el stock: se reconstruyen las ventas ponderadas desde la velocidad guardada
+        variant_sales = {
+            'total_sold': record.get('total_sold', 0),
+            'order_count': record.get('order_count', 0),
+            'weighted_sold': record.get('sales_velocity', 0.0) * decay_window_days(),
+        }
+
+    record.update(calculate_popularity_metrics(record['stock'], variant_sales))
+    return record
+
+def product_image_url(product):
+    """URL de la imagen principal (campo image, o la primera de images)"""
+    image = product.get('image') or next(iter(product.get('images') or []), None)
+    return str(image['src']) if image and image.get('src') else ''
+
+def build_variant_records(product, product_collections, sales_data):
+    """Registros (uno por variante) de un producto con sus colecciones y métricas de ventas"""
+    tags = product.get('tags') or ''
+    image_url = product_image_url(product)
+    records = []
+
+    for variant in product.get('variants') or []:
+        stock = variant.get('inventory_quantity') or 0
+        variant_sales = sales_data.get(f"{product['id']}-{variant['id']}", {})
+
+        records.append({
+            # Datos básicos del producto
+            'product_id': str(product['id']),
+            'variant_id': str(variant['id']),
+            'title': product.get('title'),
+            'sku': variant.get('sku') or '',
+            'price': float(variant['price']) if variant.get('price') else 0,
+            'stock': stock,
+            'product_type': product.get('product_type') or '',
+            'vendor': product.get('vendor') or '',
+            'tags': tags.split(', ') if tags else [],
+            'tags_str': tags,  # Para compatibilidad con app.py
+            'handle': product.get('handle'),
+            'image_url': image_url,
+            'available': stock > 0,
+
+            # DATOS DE COLECCIONES (requeridos por el pipeline de filtrado)
+            'collections': product_collections,
+            'collection_handles': [col['collection_handle'] for col in product_collections],
+            'collection_titles': [col['collection_title'] for col in product_collections],
+
+            # MÉTRICAS DE POPULARIDAD (con datos de ventas reales)
+            **calculate_popularity_metrics(stock, variant_sales)
+        })
+
+    return records
@@ -0,0 +1,398 @@
+"""Sincronización completa, de inventario y de ventas contra la Admin API de Shopify.
+
+Todas las fases comparten un ShopifyClient (una sesión HTTP con pool de
+conexiones); colecciones, productos y órdenes se descargan en paralelo y las
+membresías de colecciones se reparten entre `concurrency` hilos. Cada fase
+guarda su avance en un SyncCheckpoint para poder reanudar.
+"""
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from catalog_sync import config
+from catalog_sync.checkpoint import SYNC_STATE_DIR, SyncCheckpoint
+from catalog_sync.client import ShopifyClient
+from catalog_sync.records import (accumulate_order_sales, build_variant_records,
+                                  merge_sales, refresh_record_metrics)
+
+# Campos que se piden a la API (con gzip, el resto del payload no viaja)
+PRODUCT_FIELDS = 'id,title,handle,product_type,vendor,tags,variants,image'
+INVENTORY_FIELDS = 'id,variants'
+ORDER_FIELDS = 'created_at,financial_status,line_items'
+
+def open_checkpoint(command, scope, resume=True):
+    """Checkpoint propio de cada subcomando (.sync_state/<comando>)"""
+    directory = os.path.join(SYNC_STATE_DIR, command)
+    checkpoint = SyncCheckpoint(directory=directory, scope=scope)
+    if not resume and checkpoint.resumed:
+        checkpoint.clear()
+        checkpoint = SyncCheckpoint(directory=directory, scope=scope)
+    if checkpoint.resumed:
+        print(f"♻️ Reanudando sincronización iniciada el "
+              f"{datetime.fromtimestamp(checkpoint.started_at).strftime('%Y-%m-%d %H:%M:%S')}")
+    return checkpoint
+
+def fetch_collections(client, checkpoint=None):
+    """Obtiene todas las colecciones (Custom y Smart Collections)"""
+    if checkpoint and checkpoint.is_done('collections'):
+        all_collections = checkpoint.records('collections')[-1]
+        print(f"♻️ Colecciones recuperadas del checkpoint: {len(all_collections)}")
+        return all_collections
+
+    all_collections = {}
+
+    for resource, collection_type in [('custom_collections', 'custom'), ('smart_collections', 'smart')]:
+        params = {'limit': config.PAGE_SIZE, 'fields': 'id,handle,title'}
+        for collections, _ in client.paginate(f"{resource}.json", resource, params):
+            for collection in collections:
+                all_collections[str(collection['id'])] = {
+                    'id': str(collection['id']),
+                    'handle': collection['handle'],
+                    'title': collection['title'],
+                    'type': collection_type
+                }
+
+    print(f"✅ Encontradas {len(all_collections)} colecciones")
+
+    if checkpoint:
+        checkpoint.append('collections', all_collections)
+        checkpoint.mark_done('collections')
+
+    return all_collections
+
+def fetch_products(client, checkpoint=None, fields=PRODUCT_FIELDS):
+    """Obtiene todos los productos paginando de a 250, reanudando desde el checkpoint"""
+    all_products = []
+    next_url = None
+
+    if checkpoint:
+        for record in checkpoint.records('products'):
+            all_products.extend(record['items'])
+            next_url = record['next_url']
+        if checkpoint.is_done('products') or (all_products and not next_url):
+            checkpoint.mark_done('products')
+            return all_products
+        if all_products:
+            print(f"♻️ Reanudando productos: {len(all_products)} ya descargados")
+
+    params = {'limit': config.PAGE_SIZE, 'fields': fields}
+    for products, next_url in client.paginate('products.json', 'products', params, next_url=next_url):
+        all_products.extend(products)
+        if checkpoint:
+            checkpoint.append('products', {'items': products, 'next_url': next_url})
+
+    if checkpoint:
+        checkpoint.mark_done('products')
+
+    print(f"✅ Encontrados {len(all_products)} productos en total")
+    return all_products
+
+def fetch_sales(client, checkpoint=None):
+    """Obtiene datos de ventas históricas por variante de los últimos SALES_WINDOW_DAYS días"""
+    sales_by_product = {}
+    total_orders_processed = 0
+    next_url = None
+
+    # Al reanudar se usa la misma fecha de referencia que la ejecución original
+    records = checkpoint.records('orders') if checkpoint else []
+    if checkpoint:
+        now = datetime.fromtimestamp(checkpoint.started_at, timezone.utc)
+    else:
+        now = datetime.now(timezone.utc)
+
+    for record in records:
+        merge_sales(sales_by_product, record['sales'])
+        total_orders_processed += record['processed']
+        next_url = record['next_url']
+    if records:
+        print(f"♻️ Reanudando ventas: {total_orders_processed} órdenes ya procesadas")
+
+    finished = (checkpoint and checkpoint.is_done('orders')) or (records and not next_url)
+    if not finished:
+        since_date = (now - timedelta(days=config.SALES_WINDOW_DAYS)).strftime('%Y-%m-%d')
+        print(f"   Buscando órdenes desde: {since_date}")
+
+        params = {'status': 'any', 'created_at_min': since_date, 'limit': config.PAGE_SIZE, 'fields': ORDER_FIELDS}
+        for orders, next_url in client.paginate('orders.json', 'orders', params, next_url=next_url):
+            page_sales = {}
+            page_processed = 0
+
+            for order in orders:
+                # Solo contar órdenes completadas/pagadas
+                if order.get('financial_status') in ['paid', 'partially_paid']:
+                    page_processed += 1
+                    accumulate_order_sales(order, page_sales, now)
+
+            merge_sales(sales_by_product, page_sales)
+            total_orders_processed += page_processed
+            if checkpoint:
+                checkpoint.append('orders', {'sales': page_sales, 'processed': page_processed, 'next_url': next_url})
+
+    if checkpoint:
+        checkpoint.mark_done('orders')
+
+    print(f"✅ Procesadas {total_orders_processed} órdenes pagadas ({len(sales_by_product)} variantes con ventas)")
+    return sales_by_product
+
+def fetch_collection_members(client, collection_id, members, next_url, checkpoint=None):
+    """IDs de producto de una colección, continuando desde el cursor guardado"""
+    params = {'collection_id': collection_id, 'limit': config.PAGE_SIZE, 'fields': 'id'}
+    for collection_products, next_url in client.paginate('products.json', 'products', params, next_url=next_url):
+        product_ids = [str(product['id']) for product in collection_products]
+        members.extend(product_ids)
+        if checkpoint:
+            checkpoint.append('memberships', {
+                'collection_id': collection_id,
+                'product_ids': product_ids,
+                'next_url': next_url
+            })
+    return members
+
+def fetch_memberships(client, all_collections, checkpoint=None):
+    """Mapea productos a colecciones consultando las colecciones en paralelo"""
+    # Progreso guardado: productos por colección y cursor de la última página
+    collection_members = {collection_id: [] for collection_id in all_collections}
+    collection_cursors = {}
+    if checkpoint:
+        for record in checkpoint.records('memberships'):
+            collection_members.setdefault(record['collection_id'], []).extend(record['product_ids'])
+            collection_cursors[record['collection_id']] = record['next_url']
+
+    pending = [collection_id for collection_id in all_collections
+               if not (collection_id in collection_cursors and not collection_cursors[collection_id])]
+    if len(pending) < len(all_collections):
+        print(f"♻️ {len(all_collections) - len(pending)} colecciones recuperadas del checkpoint")
+
+    with ThreadPoolExecutor(max_workers=client.concurrency) as executor:
+        futures = [
+            executor.submit(fetch_collection_members, client, collection_id, collection_members[collection_id],
+                            collection_cursors.get(collection_id), checkpoint)
+            for collection_id in pending
+        ]
+        for future in futures:
+            future.result()
+
+    if checkpoint:
+        checkpoint.mark_done('memberships')
+
+    # Mapear productos a colecciones (en el orden de las colecciones, sin importar qué hilo terminó primero)
+    product_collections_map = {}
+    for collection_id, collection_data in all_collections.items():
+        for product_id in collection_members[collection_id]:
+            product_collections_map.setdefault(product_id, []).append({
+                'collection_id': collection_id,
+                'collection_handle': collection_data['handle'],
+                'collection_title': collection_data['title']
+            })
+
+    return product_collections_map
+
+def read_products_file(output):
+    with open(output, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def write_products_file(products_data, output, backup=False):
+    """Escribe el archivo de forma atómica (la app nunca lee un JSON a medias)"""
+    if backup and os.path.exists(output):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        root, ext = os.path.splitext(output)
+        backup_filename = f'{root}_backup_{timestamp}{ext}'
+        shutil.copy2(output, backup_filename)
+        print(f"\n💾 Backup creado: {backup_filename}")
+
+    tmp_path = output + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(products_data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, output)
+
+def sync_full(resume=True, concurrency=None, output=config.OUTPUT_FILE, client=None):
+    """Sincronización completa: colecciones, productos, ventas y membresías.
+
+    Cada fase guarda su avance en un checkpoint (ver catalog_sync/checkpoint.py);
+    si la sincronización falla, la siguiente ejecución continúa desde la última
+    página completada. Con resume=False se descarta el checkpoint.
+    """
+    client = client or ShopifyClient(concurrency=concurrency)
+
+    print(f"🚀 Iniciando sincronización de productos con colecciones y ventas...")
+    print(f"   Tienda: {client.api_url}")
+    print(f"   Conexiones simultáneas: {client.concurrency}")
+    print(f"   Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    checkpoint = open_checkpoint('full', client.api_url, resume)
+
+    try:
+        # PASOS 1-3: colecciones, productos y ventas no dependen entre sí
+        print(f"\n📥 PASOS 1-3: Obteniendo colecciones, productos y ventas...")
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            collections_future = executor.submit(fetch_collections, client, checkpoint)
+            products_future = executor.submit(fetch_products, client, checkpoint)
+            sales_future = executor.submit(fetch_sales, client, checkpoint)
+            all_collections = collections_future.result()
+            all_products = products_future.result()
+            sales_data = sales_future.result()
+
+        # PASO 4: Mapear productos a colecciones
+        print(f"\n🔗 PASO 4: Mapeando productos a colecciones...")
+        product_collections_map = fetch_memberships(client, all_collections, checkpoint)
+
+        # PASO 5: Procesar productos y variantes
+        print(f"\n⚙️ PASO 5: Procesando productos y variantes...")
+        products_data = []
+        for product in all_products:
+            products_data.extend(build_variant_records(
+                product, product_collections_map.get(str(product['id']), []), sales_data))
+
+        # PASO 6: Guardar datos nuevos (con backup del archivo anterior)
+        print(f"\n💾 PASO 6: Guardando datos...")
+        write_products_file(products_data, output, backup=True)
+
+        # El archivo quedó completo: el checkpoint ya no se necesita
+        checkpoint.clear()
+
+        print_sync_stats(products_data, all_collections, sales_data, output)
+        print(f"\n🌐 Llamadas a la API: {client.calls} ({client.retries} reintentos)")
+        return products_data
+
+    except Exception as e:
+        print(f"❌ Error en sincronización: {e}")
+        print(f"💾 Avance guardado en {checkpoint.directory}: la próxima ejecución continuará desde aquí")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def sync_inventory(resume=True, concurrency=None, output=config.OUTPUT_FILE, client=None):
+    """Actualiza solo stock y disponibilidad de los registros existentes.
+
+    Descarga únicamente id y variantes de cada producto; las métricas que
+    dependen del stock (days_of_cover, final_ranking_score) se recalculan con
+    la velocidad de ventas ya guardada. Las variantes nuevas necesitan una
+    sincronización completa (colecciones y ventas).
+    """
+    client = client or ShopifyClient(concurrency=concurrency)
+
+    print(f"📦 Sincronizando inventario contra {client.api_url}...")
+    try:
+        products_data = read_products_file(output)
+    except (OSError, ValueError) as e:
+        print(f"❌ No se pudo leer {output} ({e}): ejecuta primero una sincronización completa")
+        return None
+
+    checkpoint = open_checkpoint('inventory', client.api_url, resume)
+
+    try:
+        stock_by_variant = {}
+        for product in fetch_products(client, checkpoint, fields=INVENTORY_FIELDS):
+            for variant in product.get('variants') or []:
+                stock_by_variant[str(variant['id'])] = variant.get('inventory_quantity') or 0
+
+        updated_data = []
+        changed = 0
+        for record in products_data:
+            stock = stock_by_variant.pop(record['variant_id'], None)
+            if stock is None:
+                continue  # La variante ya no existe en la tienda
+            if stock != record['stock']:
+                changed += 1
+            updated_data.append(refresh_record_metrics(record, stock=stock))
+
+        write_products_file(updated_data, output)
+        checkpoint.clear()
+
+        print(f"✅ INVENTARIO ACTUALIZADO")
+        print(f"   🔄 Variantes con stock modificado: {changed}")
+        print(f"   🗑️ Variantes eliminadas: {len(products_data) - len(updated_data)}")
+        if stock_by_variant:
+            print(f"   ⚠️ Variantes nuevas sin sincronizar: {len(stock_by_variant)} (corre 'full' para incluirlas)")
+        print(f"   🌐 Llamadas a la API: {client.calls}")
+        return updated_data
+
+    except Exception as e:
+        print(f"❌ Error sincronizando inventario: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def sync_sales(resume=True, concurrency=None, output=config.OUTPUT_FILE, client=None):
+    """Recalcula las métricas de ventas de los registros existentes con las órdenes recientes"""
+    client = client or ShopifyClient(concurrency=concurrency)
+
+    print(f"📊 Sincronizando ventas contra {client.api_url}...")
+    try:
+        products_data = read_products_file(output)
+    except (OSError, ValueError) as e:
+        print(f"❌ No se pudo leer {output} ({e}): ejecuta primero una sincronización completa")
+        return None
+
+    checkpoint = open_checkpoint('sales', client.api_url, resume)
+
+    try:
+        sales_data = fetch_sales(client, checkpoint)
+        for record in products_data:
+            refresh_record_metrics(record, sales_data=sales_data)
+
+        write_products_file(products_data, output)
+        checkpoint.clear()
+
+        products_with_sales = sum(1 for p in products_data if p.get('total_sold', 0) > 0)
+        print(f"✅ VENTAS ACTUALIZADAS")
+        print(f"   🛒 Productos con ventas: {products_with_sales}")
+        print(f"   🌐 Llamadas a la API: {client.calls}")
+        return products_data
+
+    except Exception as e:
+        print(f"❌ Error sincronizando ventas: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def print_sync_stats(products_data, all_collections, sales_data, output):
+    """Estadísticas finales de una sincronización completa"""
+    print(f"\n✅ SINCRONIZACIÓN COMPLETADA")
+    print(f"   📦 Total productos/variantes: {len(products_data)}")
+    print(f"   📂 Total colecciones: {len(all_collections)}")
+    print(f"   💾 Archivo guardado: {output}")
+
+    # Top 10 variantes más vendidas según las órdenes
+    sorted_sales = sorted(sales_data.values(), key=lambda x: x['total_sold'], reverse=True)[:10]
+    print(f"\n🏆 TOP 10 PRODUCTOS MÁS VENDIDOS (últimos {config.SALES_WINDOW_DAYS} días):")
+    for i, data in enumerate(sorted_sales, 1):
+        print(f"   {i}. {data['product_title']}: {data['total_sold']} unidades vendidas")
+
+    # Estadísticas de ventas
+    products_with_sales = sum(1 for p in products_data if p.get('total_sold', 0) > 0)
+    total_units_sold = sum(p.get('total_sold', 0) for p in products_data)
+
+    print(f"\n📊 ESTADÍSTICAS DE VENTAS (últimos {config.SALES_WINDOW_DAYS} días):")
+    print(f"   🛒 Productos con ventas: {products_with_sales}")
+    print(f"   📦 Total unidades vendidas: {total_units_sold}")
+
+    # Estadísticas de colecciones
+    products_with_collections = sum(1 for p in products_data if p['collections'])
+    products_without_collections = len(products_data) - products_with_collections
+    print(f"\n🔗 ESTADÍSTICAS DE COLECCIONES:")
+    print(f"   ✅ Productos con colecciones: {products_with_collections}")
+    print(f"   ⚠️ Productos sin colecciones: {products_without_collections}")
+
+    # Top colecciones por número de productos
+    collection_counts = {}
+    for product in products_data:
+        for collection in product['collection_handles']:
+            collection_counts[collection] = collection_counts.get(collection, 0) + 1
+
+    print(f"\n📊 TOP 10 COLECCIONES POR NÚMERO DE PRODUCTOS:")
+    top_collections = sorted(collection_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+    for collection, count in top_collections:
+        print(f"   - {collection}: {count} productos")
+
+    # Estadísticas de stock y disponibilidad
+    available_products = sum(1 for p in products_data if p['available'])
+    total_stock = sum(p['stock'] for p in products_data)
+    avg_price = sum(p['price'] for p in products_data) / len(products_data) if products_data else 0
+
+    print(f"\n📈 ESTADÍSTICAS GENERALES:")
+    print(f"   ✅ Productos disponibles: {available_products}")
+    print(f"   📦 Stock total: {total_stock}")
+    print(f"   💰 Precio promedio: ${avg_price:,.0f}")
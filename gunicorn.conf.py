@@ -0,0 +1,26 @@
+"""Configuración de gunicorn (se lee automáticamente desde el directorio de trabajo).
+
+Con preload_app el master importa app.py y carga el catálogo una sola vez antes
+de crear los workers: los workers arrancan ya listos y comparten las páginas de
+memoria del catálogo por copy-on-write en vez de cargar cada uno su copia.
+GUNICORN_PRELOAD=false vuelve al modo en que cada worker carga por su cuenta.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+timeout = 120
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() != 'false'
+
+def when_ready(server):
+    """Corre en el master antes de crear los workers"""
+    if not server.cfg.preload_app:
+        return
+
+    import app
+    app.ensure_products_loaded()
+
+    # Objetos del master fuera del GC: las recolecciones de los workers no
+    # tocan sus headers y las páginas compartidas no se copian
+    gc.freeze()
@@ -0,0 +1,318 @@
+"""Caché compartida de recomendaciones entre workers de gunicorn y réplicas.
+
+Por defecto guarda los resultados en disco (un archivo JSON por clave), lo que
+comparten todos los workers de un contenedor. Con CACHE_BACKEND=redis y
+REDIS_URL se usa un servidor Redis compatible, compartido entre réplicas.
+Las claves incluyen la generación del catálogo, así que una nueva carga de
+productos deja obsoletas las entradas anteriores sin borrarlas una a una.
+En disco la cantidad de entradas está acotada (CACHE_MAX_ENTRIES, más hasta
+PRUNE_EVERY_WRITES por proceso entre limpiezas): los parámetros los elige el
+cliente (p.ej. cualquier presupuesto) y sin tope llenarían el disco dentro
+del TTL.
+Si el backend falla (p.ej. Redis caído) las recomendaciones se calculan al
+momento, sin esperar el lock de otro worker.
+"""
+import hashlib
+import json
+import os
+import secrets
+import tempfile
+import time
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'disk')
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'skincare_cache'))
+CACHE_TTL = int(os.getenv('CACHE_TTL', 3600))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 5000))
+# Limpieza periódica del disco: cada tantas escrituras o segundos por proceso
+PRUNE_EVERY_WRITES = 100
+PRUNE_INTERVAL = 300
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+# Tras un error de Redis no se vuelve a intentar hasta pasado este tiempo
+REDIS_TIMEOUT = 1
+REDIS_RETRY_INTERVAL = 30
+
+# Single-flight: cuánto dura el lock de cálculo y cuánto espera el resto
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 10
+WAIT_INTERVAL = 0.05
+
+# Borra el lock solo si sigue guardando el token de quien lo tomó
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class CacheUnavailable(Exception):
+    """El backend no responde: no hay lock que esperar, se calcula al momento"""
+
+class DiskCacheBackend:
+    """Backend en disco local, compartido por los procesos del mismo contenedor"""
+
+    def __init__(self, directory=CACHE_DIR, max_entries=CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._writes = 0
+        self._last_prune = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix='.json'):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + suffix)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get('expires_at', 0) < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry.get('value')
+
+    def set(self, key, value, ttl=CACHE_TTL):
+        expires_at = time.time() + ttl
+        entry = {'key': key, 'expires_at': expires_at, 'value': value}
+        # Escritura atómica: otros workers nunca leen un archivo a medias
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            # El mtime guarda el vencimiento: prune no necesita abrir cada archivo
+            os.utime(tmp_path, (expires_at, expires_at))
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+        self._writes += 1
+        if self._writes >= PRUNE_EVERY_WRITES or time.monotonic() - self._last_prune > PRUNE_INTERVAL:
+            self.prune()
+
+    def acquire_lock(self, key, timeout=LOCK_TIMEOUT):
+        """Token del lock si se obtuvo, None si lo tiene otro proceso"""
+        path = self._path(key, '.lock')
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+            return True
+        except FileExistsError:
+            pass
+        except OSError as e:
+            raise CacheUnavailable(e)
+
+        # Lock huérfano de un worker que murió calculando
+        try:
+            if time.time() - os.path.getmtime(path) > timeout:
+                os.remove(path)
+                return self.acquire_lock(key, timeout)
+        except OSError:
+            pass
+        return None
+
+    def release_lock(self, key, token=None):
+        try:
+            os.remove(self._path(key, '.lock'))
+        except OSError:
+            pass
+
+    def prune(self):
+        """Elimina entradas expiradas y, sobre max_entries, las que vencen antes"""
+        self._writes = 0
+        self._last_prune = time.monotonic()
+        now = time.time()
+        entries = []
+        removed = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith('.json'):
+                        try:
+                            entries.append((entry.stat().st_mtime, entry.path))
+                        except OSError:
+                            continue
+        except OSError:
+            return 0
+
+        entries.sort()
+        # Se deja margen bajo el tope para no limpiar en cada escritura
+        excess = len(entries) - int(self.max_entries * 0.9) if len(entries) > self.max_entries else 0
+        for i, (expires_at, path) in enumerate(entries):
+            if expires_at >= now and i >= excess:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                continue
+        return removed
+
+class RedisCacheBackend:
+    """Backend Redis compartido entre réplicas.
+
+    Acepta cualquier cliente con la interfaz get/set(nx, px)/eval/ping de
+    redis-py, lo que permite usar un cliente falso en local. Cada lock guarda
+    un token aleatorio y solo se borra si el token coincide: si el cálculo
+    dura más que LOCK_TIMEOUT y otro worker tomó el lock, no se le quita.
+    Tras un error se deja de consultar Redis por REDIS_RETRY_INTERVAL
+    segundos para que cada request no espere el timeout de conexión.
+    """
+
+    def __init__(self, client=None, url=REDIS_URL, prefix='skincare:'):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url, socket_connect_timeout=REDIS_TIMEOUT, socket_timeout=REDIS_TIMEOUT)
+        self.client = client
+        self.prefix = prefix
+        self._down_until = 0
+
+    def ping(self):
+        """Verifica la conexión (from_url no conecta hasta el primer comando)"""
+        self.client.ping()
+
+    def _available(self):
+        return time.monotonic() >= self._down_until
+
+    def _failed(self, action, error):
+        print(f"⚠️ Error {action} Redis: {error}; sin caché por {REDIS_RETRY_INTERVAL}s")
+        self._down_until = time.monotonic() + REDIS_RETRY_INTERVAL
+
+    def get(self, key):
+        if not self._available():
+            return None
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            self._failed('leyendo caché', e)
+            return None
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def set(self, key, value, ttl=CACHE_TTL):
+        if not self._available():
+            return
+        try:
+            self.client.set(self.prefix + key, json.dumps(value, ensure_ascii=False), px=int(ttl * 1000))
+        except Exception as e:
+            self._failed('escribiendo caché', e)
+
+    def acquire_lock(self, key, timeout=LOCK_TIMEOUT):
+        """Token del lock si se obtuvo, None si lo tiene otro worker"""
+        if not self._available():
+            raise CacheUnavailable('Redis no disponible')
+        token = secrets.token_hex(16)
+        try:
+            acquired = self.client.set(self.prefix + 'lock:' + key, token, nx=True, px=int(timeout * 1000))
+        except Exception as e:
+            self._failed('tomando lock en', e)
+            raise CacheUnavailable(e)
+        return token if acquired else None
+
+    def release_lock(self, key, token=None):
+        if token is None:
+            return
+        try:
+            self.client.eval(RELEASE_LOCK_SCRIPT, 1, self.prefix + 'lock:' + key, token)
+        except Exception as e:
+            # El lock vence solo a los LOCK_TIMEOUT segundos
+            self._failed('soltando lock en', e)
+
+    def prune(self):
+        # Redis expira las claves por sí solo
+        return 0
+
+class NullCacheBackend:
+    """Backend que no guarda nada (CACHE_BACKEND=none)"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=CACHE_TTL):
+        pass
+
+    def acquire_lock(self, key, timeout=LOCK_TIMEOUT):
+        return True
+
+    def release_lock(self, key, token=None):
+        pass
+
+    def prune(self):
+        return 0
+
+def create_cache_backend(name=CACHE_BACKEND):
+    """Crea el backend configurado; si Redis no está disponible usa disco"""
+    name = (name or 'disk').lower()
+    if name == 'none':
+        return NullCacheBackend()
+    if name == 'redis':
+        try:
+            backend = RedisCacheBackend()
+            backend.ping()
+            return backend
+        except Exception as e:
+            print(f"⚠️ Redis no disponible ({e}), usando caché en disco")
+    return DiskCacheBackend()
+
+def make_key(namespace, generation, params):
+    """Clave estable a partir de la generación del catálogo y los parámetros"""
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+    return f"{namespace}:{generation}:{digest}"
+
+def _compute_with_lock(backend, key, token, compute, ttl):
+    """Calcula y publica el valor teniendo el lock (otro worker pudo publicarlo antes)"""
+    try:
+        value = backend.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                backend.set(key, value, ttl)
+        return value
+    finally:
+        backend.release_lock(key, token)
+
+def get_or_compute(backend, key, compute, ttl=CACHE_TTL):
+    """Devuelve el valor cacheado o lo calcula una sola vez entre todos los workers.
+
+    El worker que obtiene el lock calcula y publica el valor; los demás esperan
+    leyendo la caché y reintentan el lock: si quien calculaba falló y lo
+    soltó sin publicar, el siguiente toma el relevo sin esperar WAIT_TIMEOUT.
+    Pasado WAIT_TIMEOUT calculan localmente; si el backend no responde (lock
+    imposible de tomar, no ocupado) calculan al momento. El valor debe ser
+    serializable a JSON.
+    """
+    value = backend.get(key)
+    if value is not None:
+        return value
+
+    try:
+        token = backend.acquire_lock(key)
+        if token:
+            return _compute_with_lock(backend, key, token, compute, ttl)
+
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            value = backend.get(key)
+            if value is not None:
+                return value
+            token = backend.acquire_lock(key)
+            if token:
+                return _compute_with_lock(backend, key, token, compute, ttl)
+    except CacheUnavailable:
+        pass
+
+    return compute()
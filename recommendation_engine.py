@@ -0,0 +1,254 @@
+"""Motor de recomendación sobre arreglos NumPy.
+
+El índice por producto se compila una vez por carga del catálogo en arreglos
+paralelos (score base, stock, precio, código de paso, bitmask de colecciones
+por tipo de piel, bitmask de etiquetas de preocupación y flag vegano) más una
+tabla de strings con los campos de las opciones. Cada consulta se resuelve con
+máscaras booleanas y argpartition sobre esos arreglos; pandas solo se usa al
+compilar.
+
+Reproduce exactamente el pipeline con DataFrames de app.py: los filtros de
+colección y de etiquetas conservan su fallback (si nada coincide se sigue con
+todos los productos del paso), concern_score es la cantidad de etiquetas
+distintas encontradas y los empates se resuelven por posición en el índice.
+"""
+import numpy as np
+
+VEGAN_PATTERN = "vegano|vegan"
+
+def _popcount32(values):
+    """Bits en 1 de cada uint32 (np.bitwise_count recién existe en numpy 2)"""
+    v = values.astype(np.uint32)
+    v = v - ((v >> 1) & 0x55555555)
+    v = (v & 0x33333333) + ((v >> 2) & 0x33333333)
+    v = (v + (v >> 4)) & 0x0F0F0F0F
+    return (v * 0x01010101) >> 24
+
+def _collection_bits(handles, skin_collections):
+    """Bitmask de los tipos de piel cuyas colecciones contienen al producto"""
+    bits = 0
+    for bit, targets in enumerate(skin_collections.values()):
+        try:
+            if any(target in handles for target in targets):
+                bits |= 1 << bit
+        except TypeError:
+            continue
+    return bits
+
+def pick_diverse(ordered, product_ids, vendors, k, distinct_vendor):
+    """Recorre los candidatos en orden aplicando las restricciones de diversidad"""
+    selected = []
+    seen_products = set()
+    seen_vendors = set()
+
+    for i in ordered:
+        if product_ids[i] in seen_products:
+            continue
+        if distinct_vendor and vendors[i] in seen_vendors:
+            continue
+        selected.append(i)
+        seen_products.add(product_ids[i])
+        seen_vendors.add(vendors[i])
+        if len(selected) == k:
+            return selected
+
+    # La diversidad de marca es preferente: completar con otras marcas si faltan opciones
+    if distinct_vendor:
+        for i in ordered:
+            if product_ids[i] in seen_products:
+                continue
+            selected.append(i)
+            seen_products.add(product_ids[i])
+            if len(selected) == k:
+                break
+
+    return selected
+
+def final_ranking_scores(base_score, stock, concern_score):
+    """Score de ranking por producto (base + bonus por preocupaciones, penalizado sin stock)"""
+    concern_bonus = np.minimum(concern_score * 0.1, 0.2)
+    final_score = base_score + concern_bonus * 0.1
+    return np.where(stock > 0, final_score, final_score * 0.1)
+
+def ranking_keys(has_stock, concern_score, final_score):
+    """Clave escalar equivalente al orden (has_stock, concern_score, final_ranking_score)"""
+    # final_ranking_score < 10 y concern_score < 1e5, así cada nivel domina al siguiente
+    return has_stock.astype(float) * 1e6 + concern_score * 10 + final_score
+
+def select_top(keys, price, product_ids, vendors, k, distinct_vendor=False, price_band=None, cheapest=0):
+    """Índices de las k mejores opciones sin ordenar todos los productos.
+    
+    Selección parcial (argpartition) sobre las claves y orden exacto solo de
+    los candidatos que superan el umbral; empates por posición. La ventana
+    de candidatos se amplía solo si las restricciones de diversidad la agotan.
+    Con cheapest se agregan al final hasta ese número de productos más
+    baratos que no estén ya elegidos (candidatos para el presupuesto).
+    """
+    eligible = np.ones(len(keys), dtype=bool)
+    if price_band:
+        min_price, max_price = price_band
+        if min_price is not None:
+            eligible &= price >= min_price
+        if max_price is not None:
+            eligible &= price <= max_price
+
+    positions = np.flatnonzero(eligible)
+    if len(positions) == 0:
+        return []
+
+    eligible_keys = keys[positions]
+    window = min(len(positions), max(4 * k, 8))
+    while True:
+        if window < len(positions):
+            threshold = eligible_keys[np.argpartition(-eligible_keys, window - 1)[window - 1]]
+            candidates = positions[eligible_keys >= threshold]
+        else:
+            candidates = positions
+        # Orden exacto de los candidatos; empates por posición original (como sort estable)
+        ordered = candidates[np.lexsort((candidates, -keys[candidates]))]
+
+        selected = pick_diverse(ordered, product_ids, vendors, k, distinct_vendor)
+        if len(selected) == k or window >= len(positions):
+            break
+        window = min(len(positions), window * 4)
+
+    if cheapest:
+        seen_products = {product_ids[i] for i in selected}
+        added = 0
+        # Precio ascendente; empates por clave descendente y posición
+        for i in positions[np.lexsort((positions, -keys[positions], price[positions]))]:
+            if product_ids[i] in seen_products:
+                continue
+            selected.append(i)
+            seen_products.add(product_ids[i])
+            added += 1
+            if added == cheapest:
+                break
+    return selected
+
+class StepMatch:
+    """Productos de un paso después de los filtros de tipo de piel y preocupaciones"""
+    __slots__ = ('positions', 'concern_score', 'final_score', 'keys')
+
+    def __init__(self, positions, concern_score, final_score, keys):
+        self.positions = positions
+        self.concern_score = concern_score
+        self.final_score = final_score
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.positions)
+
+class CompiledCatalog:
+    """Índice por producto compilado en arreglos paralelos"""
+
+    def __init__(self, index, steps, skin_collections, concern_tags, image_columns=('imagen_url',)):
+        self.size = len(index)
+        self.steps = {paso: code for code, paso in enumerate(steps)}
+
+        # Columnas numéricas
+        self.stock = index['stock'].to_numpy(dtype=float)
+        self.base_score = index['base_ranking_score'].to_numpy(dtype=float)
+        self.price = index['price'].to_numpy(dtype=float)
+        self.precio = index['precio'].to_numpy(dtype=float)
+        self.has_stock = self.stock > 0
+        available = (index['available'] == True).to_numpy(dtype=bool)
+        vegan = index['etiquetas_shopify'].str.contains(VEGAN_PATTERN, case=False, na=False).to_numpy(dtype=bool)
+        self.step_code = index['step_category'].map(self.steps).fillna(-1).to_numpy(dtype=np.int16)
+
+        # Tipo de piel: un bit por tipo si el producto está en alguna de sus colecciones
+        self.skin_bits = {tipo: 1 << bit for bit, tipo in enumerate(skin_collections)}
+        self.skin_mask = np.fromiter(
+            (_collection_bits(handles, skin_collections) for handles in index['collection_handles']),
+            dtype=np.uint8, count=self.size
+        )
+
+        # Preocupaciones: un bit por etiqueta distinta (concern_score = etiquetas en común)
+        tags = sorted({tag for concern in concern_tags.values() for tag in concern})
+        if len(tags) > 32:
+            raise ValueError(f"Demasiadas etiquetas de preocupación para el bitmask: {len(tags)}")
+        tag_bits = {tag: 1 << bit for bit, tag in enumerate(tags)}
+        self.concern_bits = {}
+        for concern, concern_list in concern_tags.items():
+            bits = 0
+            for tag in concern_list:
+                bits |= tag_bits[tag]
+            self.concern_bits[concern] = bits
+        product_tags = index['tags_str'].map(lambda value: str(value).lower())
+        self.tag_mask = np.zeros(self.size, dtype=np.uint32)
+        for tag, bit in tag_bits.items():
+            self.tag_mask[product_tags.str.contains(tag, regex=False).to_numpy(dtype=bool)] |= np.uint32(bit)
+
+        # Tabla de strings (solo se leen para las opciones elegidas)
+        self.product_ids = index['product_id'].astype(str).to_numpy()
+        self.vendors = index['vendor'].astype(str).str.strip().str.lower().to_numpy()
+        self.names = [str(name) for name in index['name']]
+        self.urls = [str(url) for url in index['url']]
+        # Las URLs de imagen (y sus variantes de tamaño) ya vienen normalizadas desde la carga
+        self.images = {column: index[column].tolist() for column in image_columns}
+
+        # Posiciones disponibles por (vegano, paso), en el orden del índice
+        bases = {False: available, True: available & vegan}
+        self.base_count = {vegano: int(mask.sum()) for vegano, mask in bases.items()}
+        self.step_positions = {
+            (vegano, paso): np.flatnonzero(mask & (self.step_code == code))
+            for vegano, mask in bases.items()
+            for paso, code in self.steps.items()
+        }
+
+    def match_step(self, vegano, paso, tipo_piel, preocupaciones):
+        """Filtra un paso por colección de tipo de piel y etiquetas de preocupación"""
+        positions = self.step_positions.get((bool(vegano), paso))
+        if positions is None or len(positions) == 0:
+            return StepMatch(np.empty(0, dtype=np.intp), np.empty(0), np.empty(0), np.empty(0))
+
+        if tipo_piel:
+            bit = self.skin_bits.get(tipo_piel.lower(), 0)
+            in_collection = (self.skin_mask[positions] & bit) != 0
+            if in_collection.any():
+                positions = positions[in_collection]
+
+        concern_score = np.zeros(len(positions))
+        if preocupaciones:
+            target = 0
+            for concern in preocupaciones:
+                target |= self.concern_bits.get(concern.lower(), 0)
+            matched = _popcount32(self.tag_mask[positions] & np.uint32(target))
+            if matched.any():
+                keep = matched > 0
+                positions = positions[keep]
+                concern_score = matched[keep].astype(float)
+
+        final_score = final_ranking_scores(self.base_score[positions], self.stock[positions], concern_score)
+        keys = ranking_keys(self.has_stock[positions], concern_score, final_score)
+        return StepMatch(positions, concern_score, final_score, keys)
+
+    def select_top_options(self, match, k, distinct_vendor=False, price_band=None, cheapest=0):
+        """Las k mejores opciones de un paso (misma selección que app.select_top_options)"""
+        if len(match) == 0:
+            return []
+
+        positions = match.positions
+        selected = select_top(match.keys, self.price[positions], self.product_ids[positions],
+                              self.vendors[positions], k, distinct_vendor, price_band, cheapest)
+        return [self.option(match, i) for i in selected]
+
+    def option(self, match, i):
+        """Dict de un producto elegido con los campos de create_product_option y del presupuesto"""
+        position = match.positions[i]
+        return {
+            'product_id': self.product_ids[position],
+            'name': self.names[position],
+            'precio': float(self.precio[position]),
+            'price': float(self.price[position]),
+            'url': self.urls[position],
+            **{column: images[position] for column, images in self.images.items()},
+            'vendor': self.vendors[position],
+            'has_stock': bool(self.has_stock[position]),
+            'concern_score': float(match.concern_score[i]),
+            'final_ranking_score': float(match.final_score[i]),
+        }
+
+def compile_catalog(index, steps, skin_collections, concern_tags, image_columns=('imagen_url',)):
+    """Compila el índice por producto (DataFrame) para el motor NumPy"""
+    return CompiledCatalog(index, steps, skin_collections, concern_tags, image_columns)
@@ -0,0 +1,88 @@
+"""Pruebas del optimizador de rutinas por presupuesto contra fuerza bruta"""
+import itertools
+import random
+
+import pytest
+
+import app
+
+app.import_data_libraries()
+
+TRIALS = 1500
+
+def random_steps(rng):
+    """Candidatos por paso sin ordenar, con product_id distintos dentro de cada paso"""
+    return [
+        [{
+            'product_id': f'{paso}-{j}',
+            'has_stock': rng.random() < 0.8,
+            'concern_score': rng.choice([0, 1, 2, 3, None]),
+            'final_ranking_score': round(rng.random(), 2),
+            'price': rng.randint(5, 60) * 1000,
+        } for j in range(rng.randint(1, 4))]
+        for paso in range(rng.randint(1, 4))
+    ]
+
+def score(combo):
+    return sum(app.candidate_ranking_keys(list(combo)))
+
+def ids(combo):
+    return [p['product_id'] for p in combo]
+
+def feasible(steps, presupuesto):
+    return [combo for combo in itertools.product(*steps) if sum(p['price'] for p in combo) <= presupuesto]
+
+def assert_same_score(got, expected):
+    assert (got is None) == (expected is None)
+    if expected is not None:
+        assert score(got) == pytest.approx(expected, abs=1e-9)
+
+@pytest.mark.parametrize('with_exclusion', [False, True])
+def test_optimizer_matches_brute_force(with_exclusion):
+    rng = random.Random(5)
+    for _ in range(TRIALS):
+        steps = random_steps(rng)
+        # Incluye presupuestos sin ninguna rutina posible
+        presupuesto = rng.randint(3, 200) * 1000
+        excluir = [rng.choice(candidatos)['product_id'] for candidatos in steps] if with_exclusion else None
+
+        combos = [combo for combo in feasible(steps, presupuesto) if ids(combo) != excluir]
+        expected = max((score(combo) for combo in combos), default=None)
+        got = app.optimize_routine_under_budget(steps, presupuesto, excluir=excluir)
+
+        assert_same_score(got, expected)
+        if got is not None:
+            assert sum(p['price'] for p in got) <= presupuesto
+            assert ids(got) != excluir
+
+def test_budget_options_match_brute_force():
+    rng = random.Random(11)
+    for _ in range(TRIALS):
+        steps = random_steps(rng)
+        presupuesto = rng.randint(3, 200) * 1000
+        combos = feasible(steps, presupuesto)
+
+        opcion_1, opcion_2 = app.build_budget_options(steps, presupuesto)
+        if not combos:
+            assert opcion_1 is None and opcion_2 is None
+            continue
+
+        assert_same_score(opcion_1, max(score(combo) for combo in combos))
+
+        # Opción 2: cambia todos los pasos que tienen alternativa; si no cabe, cualquier otra rutina
+        elegidos = ids(opcion_1)
+        swapped = [combo for combo in combos
+                   if all(p['product_id'] != elegido or len(candidatos) == 1
+                          for p, elegido, candidatos in zip(combo, elegidos, steps))]
+        others = [combo for combo in combos if ids(combo) != elegidos]
+        if swapped:
+            assert_same_score(opcion_2, max(score(combo) for combo in swapped))
+        elif others:
+            assert_same_score(opcion_2, max(score(combo) for combo in others))
+        else:
+            assert ids(opcion_2) == elegidos
+
+@pytest.mark.parametrize('presupuesto', [float('nan'), float('inf'), float('-inf'), 0, -5, True, '100'])
+def test_invalid_budget_is_rejected(presupuesto):
+    respuestas = {'tipo_piel': 'grasa', 'preocupaciones': [], 'vegano': False, 'presupuesto': presupuesto}
+    assert app.validate_user_responses(respuestas)[0] is False
@@ -0,0 +1,119 @@
+"""Reanudación de la sincronización completa contra el Shopify simulado"""
+import contextlib
+import io
+import os
+
+import pytest
+import requests
+
+from benchmarks.mock_shopify import MockShopifyServer, MockShopifyStore
+from catalog_sync import ShopifyClient, config, sync
+
+PAGE_SIZE = 50
+# Métricas que dependen del instante de la sincronización (decaimiento de las ventas)
+TIMING_TOLERANCE = {'sales_velocity': 1e-3, 'days_of_cover': 0.2}
+
+class FailingClient(ShopifyClient):
+    """Cliente que falla (como tras agotar los reintentos) en la llamada fail_at que cumple matches"""
+
+    def __init__(self, *args, matches, fail_at, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.matches = matches
+        self.fail_at = fail_at
+        self.matched = 0
+
+    def get(self, path_or_url, params=None):
+        if self.matches(path_or_url, params or {}):
+            with self.lock:
+                self.matched += 1
+                failing = self.matched == self.fail_at
+            if failing:
+                raise requests.ConnectionError('Conexión perdida')
+        return super().get(path_or_url, params)
+
+def is_products_page(url, params):
+    return 'products.json' in url and 'collection_id' not in params and 'collection_id' not in url
+
+def is_orders_page(url, params):
+    return 'orders.json' in url
+
+def is_collection_start(url, params):
+    return 'collection_id' in params
+
+@pytest.fixture(scope='module')
+def store():
+    return MockShopifyStore(num_products=150, num_orders=400, seed=3)
+
+def make_client(server, cls=ShopifyClient, **kwargs):
+    return cls(api_url=server.url, access_token='test-token', concurrency=4, **kwargs)
+
+def run_full(client):
+    output = io.StringIO()
+    with client, contextlib.redirect_stdout(output):
+        records = sync.sync_full(client=client, output='shopify_products.json')
+    return records, output.getvalue()
+
+def use_sync_dir(monkeypatch, directory):
+    """Checkpoints y archivo de salida en directory; páginas chicas para tener varias"""
+    monkeypatch.chdir(directory)
+    monkeypatch.setattr(config, 'PAGE_SIZE', PAGE_SIZE)
+    monkeypatch.setattr(config, 'RETRY_BASE_SECONDS', 0.01)
+
+@pytest.fixture(scope='module')
+def clean_records(store, tmp_path_factory):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        use_sync_dir(monkeypatch, tmp_path_factory.mktemp('clean'))
+        with MockShopifyServer(store) as server:
+            records, _ = run_full(make_client(server))
+    assert records
+    return records
+
+@pytest.fixture
+def server(store, monkeypatch, tmp_path):
+    use_sync_dir(monkeypatch, tmp_path)
+    with MockShopifyServer(store) as server:
+        yield server
+
+def assert_same_records(records, expected):
+    assert len(records) == len(expected)
+    for record, expected_record in zip(records, expected):
+        assert record.keys() == expected_record.keys()
+        for field, value in expected_record.items():
+            if field in TIMING_TOLERANCE:
+                assert record[field] == pytest.approx(value, abs=TIMING_TOLERANCE[field]), field
+            else:
+                assert record[field] == value, field
+
+@pytest.mark.parametrize('matches, fail_at, resumed_message', [
+    (is_products_page, 3, 'Reanudando productos'),
+    (is_orders_page, 4, 'Reanudando ventas'),
+    (is_collection_start, 6, 'colecciones recuperadas del checkpoint'),
+])
+def test_resume_after_client_error(server, clean_records, matches, fail_at, resumed_message):
+    records, _ = run_full(make_client(server, FailingClient, matches=matches, fail_at=fail_at))
+    assert records is None
+    assert os.path.isdir(os.path.join(sync.SYNC_STATE_DIR, 'full'))
+
+    records, output = run_full(make_client(server))
+    assert resumed_message in output
+    assert_same_records(records, clean_records)
+    assert not os.path.exists(os.path.join(sync.SYNC_STATE_DIR, 'full'))
+
+@pytest.mark.parametrize('fail_at', [2, 9, 20])
+def test_resume_after_server_errors_past_retry_limit(store, clean_records, monkeypatch, tmp_path, fail_at):
+    use_sync_dir(monkeypatch, tmp_path)
+    with MockShopifyServer(store, fail_requests=[fail_at], fail_retries=config.MAX_RETRIES) as server:
+        records, _ = run_full(make_client(server))
+        assert records is None
+        assert server.stats['failed'] == config.MAX_RETRIES + 1
+
+        records, output = run_full(make_client(server))
+    assert 'Reanudando sincronización' in output
+    assert_same_records(records, clean_records)
+
+def test_server_error_within_retry_limit_is_retried(store, clean_records, monkeypatch, tmp_path):
+    use_sync_dir(monkeypatch, tmp_path)
+    with MockShopifyServer(store, fail_requests=[5]) as server:
+        records, _ = run_full(make_client(server))
+        assert server.stats['failed'] == 1
+    assert_same_records(records, clean_records)
@@ -0,0 +1,96 @@
+"""La recarga incremental del catálogo debe dar lo mismo que una carga en frío"""
+import contextlib
+import io
+import json
+import os
+import random
+
+import pandas as pd
+import pytest
+
+import app
+import recommendation_cache
+
+SOURCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shopify_products.json')
+CATALOG_SIZE = 250
+
+def change_stock(rng, records, i):
+    records[i]['stock'] = rng.randint(0, 200)
+
+def change_price(rng, records, i):
+    records[i]['price'] = float(rng.randint(1000, 90000))
+
+def change_collections(rng, records, i):
+    handles = list(records[i]['collection_handles'])
+    if handles and rng.random() < 0.5:
+        handles.pop(rng.randrange(len(handles)))
+    else:
+        handles.append(rng.choice(['piel-grasa', 'piel-seca', 'piel-mixta', 'piel-sensible', 'piel-normal']))
+    records[i]['collection_handles'] = handles
+
+def change_vendor(rng, records, i):
+    records[i]['vendor'] = rng.choice(['Anua', 'COSRX', 'Otra Marca'])
+
+def change_sales(rng, records, i):
+    records[i]['total_sold'] = rng.randint(0, 500)
+
+CHANGES = [change_stock, change_price, change_collections, change_vendor, change_sales]
+
+@pytest.fixture
+def catalog(monkeypatch, tmp_path):
+    """Catálogo reducido en un archivo temporal, sin tocar el estado global del módulo"""
+    with open(SOURCE_FILE, encoding='utf-8') as f:
+        records = json.load(f)[:CATALOG_SIZE]
+    monkeypatch.setattr(app, 'PRODUCTS_FILE', str(tmp_path / 'shopify_products.json'))
+    monkeypatch.setattr(app, 'cache_backend', recommendation_cache.NullCacheBackend())
+    for name in ['products_df', 'products_index', 'compiled_catalog', 'catalog_generation',
+                 'catalog_versions', 'image_stats']:
+        monkeypatch.setattr(app, name, getattr(app, name))
+    return records
+
+def load(records):
+    """Escribe el catálogo y lo recarga; devuelve la salida de la carga"""
+    with open(app.PRODUCTS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        assert app.load_products_from_file()
+    return output.getvalue()
+
+def assert_same_as_cold_load(records):
+    df, index, versions = app.products_df, app.products_index, app.catalog_versions
+    app.products_df = None
+    app.catalog_generation = None
+    assert 'Recarga incremental' not in load(records)
+
+    pd.testing.assert_frame_equal(df, app.products_df)
+    pd.testing.assert_frame_equal(index, app.products_index)
+    assert versions == app.catalog_versions
+
+@pytest.mark.parametrize('seed', range(4))
+def test_incremental_reload_matches_cold_load(catalog, seed):
+    rng = random.Random(seed)
+    records = catalog
+    load(records)
+
+    for change in CHANGES * 2:
+        records = [dict(record) for record in records]
+        for _ in range(rng.randint(1, 15)):
+            change(rng, records, rng.randrange(len(records)))
+
+        assert 'Recarga incremental' in load(records)
+        assert_same_as_cold_load(records)
+
+def test_incremental_reload_with_deletion_and_shuffle(catalog):
+    rng = random.Random(7)
+    records = catalog
+    load(records)
+
+    records = [dict(record) for record in records]
+    del records[rng.randrange(len(records))]
+    rng.shuffle(records)
+    for _ in range(10):
+        rng.choice(CHANGES)(rng, records, rng.randrange(len(records)))
+
+    assert 'Recarga incremental' in load(records)
+    assert_same_as_cold_load(records)
@@ -0,0 +1,188 @@
+"""Pruebas de la caché compartida y del single-flight de recommendation_cache"""
+import os
+import threading
+import time
+
+import pytest
+
+import recommendation_cache
+from recommendation_cache import DiskCacheBackend, RedisCacheBackend, get_or_compute
+
+class FakeRedis:
+    """Cliente Redis en memoria con el subconjunto que usa RedisCacheBackend.
+
+    get, set(nx, px), delete y ping se comportan como en redis-py (salvo que
+    devuelven str en vez de bytes). eval no interpreta Lua: solo implementa
+    RELEASE_LOCK_SCRIPT, es decir, borra KEYS[1] si su valor es ARGV[1].
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self.lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def set(self, key, value, nx=False, px=None):
+        with self.lock:
+            if nx and self._live(key) is not None:
+                return None
+            expires_at = time.monotonic() + px / 1000 if px is not None else None
+            self.data[key] = (value, expires_at)
+            return True
+
+    def delete(self, key):
+        with self.lock:
+            return 1 if self.data.pop(key, None) is not None else 0
+
+    def eval(self, script, numkeys, key, token):
+        assert script == recommendation_cache.RELEASE_LOCK_SCRIPT
+        with self.lock:
+            entry = self._live(key)
+            if entry is not None and entry[0] == token:
+                del self.data[key]
+                return 1
+            return 0
+
+    def ping(self):
+        return True
+
+class DownRedis:
+    """Cliente de un Redis caído: todo comando falla y se cuentan las llamadas"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _fail(self, *args, **kwargs):
+        self.calls += 1
+        raise ConnectionError('Connection refused')
+
+    get = set = delete = eval = ping = _fail
+
+@pytest.fixture(params=['redis', 'disk'])
+def make_backend(request, tmp_path):
+    """Fábrica de backends que comparten almacenamiento (como dos workers)"""
+    client = FakeRedis()
+    if request.param == 'redis':
+        return lambda: RedisCacheBackend(client=client)
+    return lambda: DiskCacheBackend(str(tmp_path))
+
+def test_cache_hit(make_backend):
+    backend = make_backend()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'rutina': ['limpiador']}
+
+    assert get_or_compute(backend, 'k', compute) == {'rutina': ['limpiador']}
+    assert get_or_compute(make_backend(), 'k', compute) == {'rutina': ['limpiador']}
+    assert len(calls) == 1
+
+def test_concurrent_callers_compute_once(make_backend):
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return {'valor': 1}
+
+    def worker():
+        results.append(get_or_compute(make_backend(), 'k', compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{'valor': 1}, {'valor': 1}]
+
+def test_waiter_takes_over_when_holder_fails(make_backend):
+    holder_started = threading.Event()
+    errors = []
+
+    def failing_compute():
+        holder_started.set()
+        time.sleep(0.2)
+        raise RuntimeError('fallo calculando')
+
+    def holder():
+        try:
+            get_or_compute(make_backend(), 'k', failing_compute)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    holder_started.wait()
+
+    start = time.monotonic()
+    assert get_or_compute(make_backend(), 'k', lambda: {'valor': 2}) == {'valor': 2}
+    elapsed = time.monotonic() - start
+    thread.join()
+
+    assert len(errors) == 1
+    assert elapsed < recommendation_cache.WAIT_TIMEOUT / 2
+
+def test_release_lock_keeps_lock_taken_by_another_worker():
+    client = FakeRedis()
+    first, second = RedisCacheBackend(client=client), RedisCacheBackend(client=client)
+
+    token = first.acquire_lock('k', timeout=0.05)
+    assert token
+    time.sleep(0.1)
+    # El lock del primero venció y lo tomó otro worker
+    assert second.acquire_lock('k')
+    first.release_lock('k', token)
+    assert second.acquire_lock('k') is None
+
+def test_redis_down_computes_immediately():
+    client = DownRedis()
+    backend = RedisCacheBackend(client=client)
+
+    start = time.monotonic()
+    assert get_or_compute(backend, 'k', lambda: {'valor': 3}) == {'valor': 3}
+    assert time.monotonic() - start < 1
+    calls = client.calls
+
+    # Con el circuito abierto no se vuelve a consultar Redis
+    assert get_or_compute(backend, 'k', lambda: {'valor': 3}) == {'valor': 3}
+    assert client.calls == calls
+
+def test_create_cache_backend_falls_back_to_disk(monkeypatch, tmp_path):
+    monkeypatch.setattr(recommendation_cache, 'RedisCacheBackend', lambda: RedisCacheBackend(client=DownRedis()))
+    monkeypatch.setattr(recommendation_cache, 'DiskCacheBackend', lambda: DiskCacheBackend(str(tmp_path)))
+    assert isinstance(recommendation_cache.create_cache_backend('redis'), DiskCacheBackend)
+
+def test_disk_prune_keeps_entries_under_max(monkeypatch, tmp_path):
+    monkeypatch.setattr(recommendation_cache, 'PRUNE_EVERY_WRITES', 10)
+    backend = DiskCacheBackend(str(tmp_path), max_entries=20)
+
+    def entries():
+        return [name for name in os.listdir(tmp_path) if name.endswith('.json')]
+
+    for i in range(200):
+        backend.set(f'k{i}', {'valor': i})
+        assert len(entries()) <= backend.max_entries + recommendation_cache.PRUNE_EVERY_WRITES
+
+    backend.prune()
+    assert len(entries()) <= backend.max_entries
+    # Se conservan las que vencen más tarde (las últimas escritas)
+    assert backend.get('k199') == {'valor': 199}
+
+    count = len(entries())
+    backend.set('vencida', {'valor': 0}, ttl=-1)
+    assert backend.prune() == 1
+    assert len(entries()) == count